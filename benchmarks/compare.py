@@ -0,0 +1,82 @@
+"""Compare two `benchmarks.run` reports and flag regressions.
+
+Latency metrics (`*_ms`, `*_us`) regress when they grow, throughput metrics
+(`*_per_second`, `speedup`) when they shrink. Exits with status 1 if any
+metric moved the wrong way by more than `--threshold` percent:
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LOWER_IS_BETTER = ("_ms", "_us")
+HIGHER_IS_BETTER = ("_per_second", "speedup")
+
+
+def direction(metric: str) -> Optional[int]:
+    """+1 if higher is better, -1 if lower is better, None if not compared."""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, float(value)
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Per-metric change between two reports; `regression` marks moves past `threshold` %."""
+    before = dict(flatten(baseline["results"]))
+    rows = []
+    for metric, new in flatten(candidate["results"]):
+        sign = direction(metric)
+        old = before.get(metric)
+        if sign is None or not old:
+            continue
+        change = (new - old) / old * 100
+        rows.append({
+            "metric": metric,
+            "baseline": old,
+            "candidate": new,
+            "change_pct": change,
+            "regression": change * sign < -threshold,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent.")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline.get("config") != candidate.get("config"):
+        print("warning: reports were produced with different configurations", file=sys.stderr)
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"baseline {baseline.get('git_sha', '?')[:12]}  candidate {candidate.get('git_sha', '?')[:12]}")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['metric']:<45} {row['baseline']:>12.2f} {row['candidate']:>12.2f} "
+            f"{row['change_pct']:>+8.1f}%  {flag}"
+        )
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
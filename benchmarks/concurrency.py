@@ -0,0 +1,108 @@
+"""Concurrency benchmark for a single API worker.
+
+Fires increasing numbers of concurrent requests at a running server and
+reports throughput and latency for each concurrency level. Run it once
+against the sync handlers and once against the async ones, each served by
+a single uvicorn worker:
+
+    uvicorn server.main:app --workers 1
+    python -m benchmarks.concurrency --url http://localhost:8000 --doc-id 10006546
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    total_requests: int,
+    make_request,
+) -> Dict[str, Any]:
+    """Run total_requests requests with at most concurrency in flight."""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "requests_per_sec": total_requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def main(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Sweep concurrency levels for the chosen endpoint."""
+    if args.endpoint == "search":
+        async def make_request(client):
+            return await client.post("/search", json={"user_query": args.query})
+    else:
+        async def make_request(client):
+            return await client.get(f"/documents/{args.doc_id}")
+
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for level in args.levels:
+            result = await run_level(client, level, args.requests_per_level, make_request)
+            results.append(result)
+            print(
+                f"concurrency={result['concurrency']:>4}  "
+                f"rps={result['requests_per_sec']:8.1f}  "
+                f"p50={result['p50_ms']:8.1f}ms  "
+                f"p99={result['p99_ms']:8.1f}ms  "
+                f"errors={result['errors']}"
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["search", "document"], default="search")
+    parser.add_argument("--query", default="apartment in Porto with wifi")
+    parser.add_argument("--doc-id", default="10006546")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64, 128, 256])
+    parser.add_argument("--requests-per-level", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
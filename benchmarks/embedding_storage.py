@@ -0,0 +1,120 @@
+"""Storage and search-latency measurements for embedding storage formats.
+
+Offline, reports the BSON size of one 768-dimension embedding in each format
+and the cosine error introduced by int8 quantization. With `--live`, also
+reports collection storage stats and `$vectorSearch` latency for the current
+collection; run it before and after `server.search.migrate_embeddings`:
+
+    python -m benchmarks.embedding_storage
+    python -m benchmarks.embedding_storage --live --output before.json
+    python -m server.search.migrate_embeddings --to int8
+    python -m benchmarks.embedding_storage --live --output after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.concurrency import percentile
+from server.common.vectors import (
+    EMBEDDING_DIMENSIONS,
+    STORAGE_FORMATS,
+    decode_embedding,
+    embedding_bson_size,
+    encode_embedding,
+)
+
+DEFAULT_QUERIES = [
+    "apartment in Porto with wifi",
+    "airbnbs in warm and sunny places with a pool",
+    "2 bedroom flat Barcelona beach",
+    "quiet cabin near hiking trails",
+    "loft in Manhattan close to the subway",
+]
+
+
+def encoding_sizes(samples: int = 100) -> Dict[str, Any]:
+    """Average embedding field size and int8 cosine error over random vectors."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(samples, EMBEDDING_DIMENSIONS)).astype(np.float32)
+    results: Dict[str, Any] = {}
+    for storage in STORAGE_FORMATS:
+        sizes, errors = [], []
+        for vector in vectors:
+            encoded = encode_embedding(vector.tolist(), storage)
+            sizes.append(embedding_bson_size(encoded))
+            decoded = np.asarray(decode_embedding(encoded), dtype=np.float32)
+            cosine = float(vector @ decoded / (np.linalg.norm(vector) * np.linalg.norm(decoded)))
+            errors.append(1 - cosine)
+        results[storage] = {
+            "bytes_per_embedding": float(np.mean(sizes)),
+            "mean_cosine_error": float(np.mean(errors)),
+        }
+    return results
+
+
+def collection_stats() -> Dict[str, Any]:
+    """Storage stats of the listings collection."""
+    # Imported here so the offline report runs without credentials.
+    from server.common.db import get_client
+
+    db = get_client()[os.getenv("MONGO_DB_NAME")]
+    stats = db.command("collStats", os.getenv("MONGO_COLLECTION_NAME"))
+    return {
+        key: stats.get(key)
+        for key in ("count", "size", "avgObjSize", "storageSize", "totalIndexSize")
+    }
+
+
+async def search_latency(queries: List[str], repeat: int, limit: int, num_candidates: int) -> Dict[str, Any]:
+    """`$vectorSearch` latency; query embeddings are cached after the first pass."""
+    from server.search.search_index import search_vector_store
+
+    async def run_once(query: str) -> float:
+        start = time.perf_counter()
+        await search_vector_store(
+            user_query=query,
+            num_candidates=num_candidates,
+            limit=limit,
+            reviews_rating=None,
+            return_full_documents=True,
+            similarity_threshold=0.0,
+        )
+        return time.perf_counter() - start
+
+    for query in queries:
+        await run_once(query)
+    latencies = [await run_once(query) for _ in range(repeat) for query in queries]
+    return {
+        "queries": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Also measure the configured collection.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--num-candidates", type=int, default=150)
+    parser.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"encodings": encoding_sizes()}
+    if args.live:
+        report["embedding_storage"] = os.getenv("EMBEDDING_STORAGE", "array")
+        report["collection"] = collection_stats()
+        report["search"] = asyncio.run(
+            search_latency(DEFAULT_QUERIES, args.repeat, args.limit, args.num_candidates)
+        )
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
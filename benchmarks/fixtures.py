@@ -0,0 +1,154 @@
+"""Sample data for benchmarks.
+
+`sample_listing` builds documents shaped like the `sample_airbnb.listingsAndReviews`
+collection (BSON types, nested host/address/review_scores, embedded reviews),
+as read back from MongoDB. `load_listings` reads real listings instead, from
+an NDJSON export (`GET /documents/export`) or from the configured collection.
+"""
+
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+from bson.decimal128 import Decimal128
+
+AMENITIES = [
+    "Wifi", "Kitchen", "Pool", "Air conditioning", "Washer", "Dryer",
+    "Free parking on premises", "Elevator", "Heating", "TV", "Hair dryer",
+    "Iron", "Laptop friendly workspace", "Hot water", "Beach essentials",
+]
+MARKETS = [
+    ("Porto", "Portugal", "PT"), ("Barcelona", "Spain", "ES"),
+    ("New York", "United States", "US"), ("Sydney", "Australia", "AU"),
+    ("Istanbul", "Turkey", "TR"), ("Hong Kong", "Hong Kong", "HK"),
+]
+PROPERTY_TYPES = ["Apartment", "House", "Condominium", "Loft", "Serviced apartment"]
+ROOM_TYPES = ["Entire home/apt", "Private room", "Shared room"]
+WORDS = (
+    "bright cozy spacious quiet modern charming central historic sunny "
+    "beach view terrace balcony garden metro walking distance restaurants "
+    "shops nightlife family friendly comfortable renovated stylish"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def sample_listing(i: int, num_reviews: int = 20, seed: Optional[int] = None) -> Dict[str, Any]:
+    """A deterministic listing document with BSON types, as stored in MongoDB."""
+    rng = random.Random(i if seed is None else seed)
+    market, country, country_code = rng.choice(MARKETS)
+    scraped = datetime(2019, 2, 16, 5, 0, tzinfo=timezone.utc)
+    price = rng.randint(20, 400)
+    return {
+        "_id": str(10000000 + i),
+        "listing_url": f"https://www.airbnb.com/rooms/{10000000 + i}",
+        "name": f"{rng.choice(WORDS).capitalize()} {rng.choice(PROPERTY_TYPES).lower()} in {market}",
+        "summary": _text(rng, 40),
+        "space": _text(rng, 60),
+        "description": _text(rng, 120),
+        "neighborhood_overview": _text(rng, 40),
+        "notes": _text(rng, 20),
+        "transit": _text(rng, 30),
+        "access": _text(rng, 20),
+        "interaction": _text(rng, 20),
+        "house_rules": _text(rng, 25),
+        "property_type": rng.choice(PROPERTY_TYPES),
+        "room_type": rng.choice(ROOM_TYPES),
+        "bed_type": "Real Bed",
+        "minimum_nights": str(rng.randint(1, 5)),
+        "maximum_nights": "30",
+        "cancellation_policy": rng.choice(["flexible", "moderate", "strict_14_with_grace_period"]),
+        "last_scraped": scraped,
+        "calendar_last_scraped": scraped,
+        "first_review": scraped - timedelta(days=rng.randint(200, 2000)),
+        "last_review": scraped - timedelta(days=rng.randint(1, 100)),
+        "accommodates": rng.randint(1, 8),
+        "bedrooms": rng.randint(0, 4),
+        "beds": rng.randint(1, 6),
+        "number_of_reviews": num_reviews,
+        "bathrooms": Decimal128(str(rng.choice([1.0, 1.5, 2.0]))),
+        "amenities": rng.sample(AMENITIES, rng.randint(4, len(AMENITIES))),
+        "price": Decimal128(f"{price}.00"),
+        "security_deposit": Decimal128(f"{price * 2}.00"),
+        "cleaning_fee": Decimal128(f"{rng.randint(10, 80)}.00"),
+        "extra_people": Decimal128("15.00"),
+        "guests_included": Decimal128("1"),
+        "images": {
+            "thumbnail_url": "",
+            "medium_url": "",
+            "picture_url": f"https://a0.muscache.com/im/pictures/{i}.jpg",
+            "xl_picture_url": "",
+        },
+        "host": {
+            "host_id": str(500000 + i),
+            "host_name": rng.choice(["Ana", "Jordi", "Sam", "Mei", "Deniz"]),
+            "host_location": f"{market}, {country}",
+            "host_about": _text(rng, 30),
+            "host_is_superhost": rng.random() < 0.3,
+            "host_listings_count": rng.randint(1, 20),
+            "host_verifications": ["email", "phone", "reviews"],
+        },
+        "address": {
+            "street": f"{market}, {country}",
+            "suburb": _text(rng, 1).rstrip("."),
+            "government_area": market,
+            "market": market,
+            "country": country,
+            "country_code": country_code,
+            "location": {
+                "type": "Point",
+                "coordinates": [rng.uniform(-180, 180), rng.uniform(-90, 90)],
+                "is_location_exact": False,
+            },
+        },
+        "availability": {
+            "availability_30": rng.randint(0, 30),
+            "availability_60": rng.randint(0, 60),
+            "availability_90": rng.randint(0, 90),
+            "availability_365": rng.randint(0, 365),
+        },
+        "review_scores": {
+            "review_scores_accuracy": rng.randint(7, 10),
+            "review_scores_cleanliness": rng.randint(7, 10),
+            "review_scores_checkin": rng.randint(7, 10),
+            "review_scores_communication": rng.randint(7, 10),
+            "review_scores_location": rng.randint(7, 10),
+            "review_scores_value": rng.randint(6, 10),
+            "review_scores_rating": rng.randint(70, 100),
+        },
+        "reviews": [
+            {
+                "_id": str(20000000 + i * 1000 + r),
+                "date": scraped - timedelta(days=r * 7),
+                "listing_id": str(10000000 + i),
+                "reviewer_id": str(30000000 + r),
+                "reviewer_name": rng.choice(["Alex", "Kim", "Lee", "Noa", "Ravi"]),
+                "comments": _text(rng, 50),
+            }
+            for r in range(num_reviews)
+        ],
+    }
+
+
+def load_listings(count: int, path: Optional[str] = None, from_mongo: bool = False) -> List[Dict[str, Any]]:
+    """Listings for a benchmark run.
+
+    Args:
+        count: Number of listings.
+        path: NDJSON file of Extended JSON listings to read instead.
+        from_mongo: Read listings from the configured collection instead.
+    """
+    if path:
+        with open(path) as f:
+            return [json_util.loads(line) for line, _ in zip(f, range(count))]
+    if from_mongo:
+        # Imported here so offline runs need no database credentials.
+        from server.common.db import get_collection
+
+        collection = get_collection(os.getenv("MONGO_DB_NAME"), os.getenv("MONGO_COLLECTION_NAME"))
+        return list(collection.find({}, {"embedding": 0}).limit(count))
+    return [sample_listing(i) for i in range(count)]
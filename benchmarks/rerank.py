@@ -0,0 +1,191 @@
+"""Local reranker vs Voyage: latency and ranking agreement.
+
+First record rerank cases: for each query, the candidates vector search
+returns, the text sent to the reranker, and Voyage's full ranking with its
+latency. Then replay the recording through `local_rerank` and compare the
+two at `--top-k`:
+
+- `overlap`: share of Voyage's top k that the local reranker also returns.
+- `top1`: how often both put the same candidate first.
+- `ndcg`: NDCG@k of the local order, with Voyage relevance scores as gains.
+
+Search order (no reranking) is reported with the same metrics as a floor.
+`--weights` sweeps `LOCAL_RERANK_WEIGHT`.
+
+    python -m benchmarks.rerank record --queries queries.txt --output rerank_cases.jsonl
+    python -m benchmarks.rerank compare rerank_cases.jsonl --top-k 5 --weights 0.3 0.5 0.7
+
+`record --synthetic` records against the benchmark stand-ins instead of
+Atlas and Voyage. The fake Voyage scores by word overlap, so agreement there
+only checks the pipeline, not the ranking quality.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from benchmarks.concurrency import percentile
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def record_cases(
+    queries: List[str],
+    num_candidates: int = 150,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """Search each query and record Voyage's full ranking of its candidates."""
+    from server.search.local_rerank import prior_score
+    from server.search.search_index import (
+        RERANK_MODEL,
+        build_rerank_documents,
+        get_voyage_client,
+        search_vector_store,
+    )
+
+    cases = []
+    for query in queries:
+        results = await search_vector_store(
+            user_query=query,
+            num_candidates=num_candidates,
+            limit=limit,
+            reviews_rating=None,
+            return_full_documents=True,
+            similarity_threshold=0.0,
+            two_phase=True,
+        )
+        if len(results) < 2:
+            continue
+        documents = build_rerank_documents(results)
+        start = time.perf_counter()
+        reranking = await get_voyage_client().rerank(
+            query, documents, model=RERANK_MODEL, top_k=len(documents)
+        )
+        voyage_ms = (time.perf_counter() - start) * 1000
+        cases.append({
+            "query": query,
+            "documents": documents,
+            "prior_scores": [prior_score(res) for res in results],
+            "voyage": [[r.index, r.relevance_score] for r in reranking.results],
+            "voyage_ms": voyage_ms,
+        })
+    return cases
+
+
+def install_synthetic(documents: int) -> List[str]:
+    """Patch in the benchmark stand-ins; returns sample queries for them."""
+    for name, value in {
+        "GOOGLE_API_KEY": "benchmark",
+        "VOYAGE_API_KEY": "benchmark",
+        "MONGO_DB_NAME": "benchmark",
+        "MONGO_COLLECTION_NAME": "listings",
+    }.items():
+        os.environ.setdefault(name, value)
+    from benchmarks.run import SEARCH_QUERIES, seed_documents
+    from benchmarks.stubs import FakeGenaiClient, FakeVoyageClient, InMemoryCollection, install_stubs
+
+    install_stubs(InMemoryCollection(seed_documents(documents)), FakeGenaiClient(), FakeVoyageClient())
+    return SEARCH_QUERIES
+
+
+def _ndcg(order: Sequence[int], gains: Dict[int, float], k: int) -> float:
+    ideal = sorted(gains.values(), reverse=True)[:k]
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    idcg = float(np.sum(np.asarray(ideal) * discounts[:len(ideal)]))
+    dcg = float(sum(gains.get(idx, 0.0) * discounts[rank] for rank, idx in enumerate(order[:k])))
+    return dcg / idcg if idcg > 0 else 1.0
+
+
+def agreement(order: Sequence[int], voyage: List[List[float]], k: int) -> Dict[str, float]:
+    """Overlap@k, top-1 agreement and NDCG@k of `order` against Voyage's ranking."""
+    reference = [int(idx) for idx, _ in voyage[:k]]
+    gains = {int(idx): float(score) for idx, score in voyage}
+    return {
+        "overlap": len(set(order[:k]) & set(reference)) / len(reference) if reference else 1.0,
+        "top1": float(bool(order) and bool(reference) and order[0] == reference[0]),
+        "ndcg": _ndcg(order, gains, k),
+    }
+
+
+def _mean(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: float(np.mean([row[key] for row in rows])) for key in rows[0]} if rows else {}
+
+
+def compare(cases: List[Dict[str, Any]], top_k: int, weights: Optional[List[float]] = None, repeat: int = 20) -> Dict[str, Any]:
+    """Agreement and latency of the local reranker, per weight, against Voyage."""
+    from server.search.local_rerank import LOCAL_RERANK_WEIGHT, local_rerank
+
+    voyage_ms = [case["voyage_ms"] / 1000 for case in cases]
+    report: Dict[str, Any] = {
+        "cases": len(cases),
+        "top_k": top_k,
+        "voyage": {
+            "p50_ms": percentile(voyage_ms, 50) * 1000,
+            "p99_ms": percentile(voyage_ms, 99) * 1000,
+        },
+        "search_order": _mean([
+            agreement(list(range(len(case["documents"]))), case["voyage"], top_k) for case in cases
+        ]),
+        "local": {},
+    }
+    for weight in weights or [LOCAL_RERANK_WEIGHT]:
+        rows, latencies = [], []
+        for case in cases:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ranking = local_rerank(case["query"], case["documents"], case["prior_scores"], top_k, weight)
+                latencies.append(time.perf_counter() - start)
+            rows.append(agreement([idx for idx, _ in ranking], case["voyage"], top_k))
+        report["local"][str(weight)] = {
+            **_mean(rows),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Record Voyage rankings of live search results.")
+    record.add_argument("--queries", help="Text file with one query per line.")
+    record.add_argument("--synthetic", action="store_true", help="Use the benchmark stand-ins.")
+    record.add_argument("--documents", type=int, default=500, help="Seeded listings with --synthetic.")
+    record.add_argument("--num-candidates", type=int, default=150)
+    record.add_argument("--limit", type=int, default=20)
+    record.add_argument("--output", default="rerank_cases.jsonl")
+
+    replay = commands.add_parser("compare", help="Compare the local reranker with a recording.")
+    replay.add_argument("cases", help="JSONL file written by `record`.")
+    replay.add_argument("--top-k", type=int, default=5)
+    replay.add_argument("--weights", type=float, nargs="+", help="LOCAL_RERANK_WEIGHT values to try.")
+    replay.add_argument("--repeat", type=int, default=20, help="Timed local reranks per case.")
+    replay.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        queries = install_synthetic(args.documents) if args.synthetic else []
+        if args.queries:
+            queries = _read_lines(args.queries)
+        if not queries:
+            parser.error("record needs --queries or --synthetic")
+        cases = asyncio.run(record_cases(queries, args.num_candidates, args.limit))
+        with open(args.output, "w") as f:
+            f.writelines(json.dumps(case) + "\n" for case in cases)
+        print(f"Recorded {len(cases)} cases to {args.output}")
+    else:
+        cases = [json.loads(line) for line in _read_lines(args.cases)]
+        report = compare(cases, args.top_k, args.weights, args.repeat)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
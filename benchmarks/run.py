@@ -0,0 +1,257 @@
+"""Offline benchmark suite.
+
+Runs the app in-process against local stand-ins (see `benchmarks.stubs`):
+an in-memory collection, or a real `mongod` with `--mongo-uri`, a
+deterministic fake Gemini embedder and a fake Voyage reranker, each with a
+configurable latency. Search goes through the local vector index. Measures:
+
+- `search`: `POST /search` p50/p99 with cold and warm query caches.
+- `crud`: `GET`/`PUT`/`POST`/`DELETE /documents` requests per second.
+- `embedding`: `embed_batch_of_documents` documents per second.
+- `serialization`: response rendering (`benchmarks.serialization`).
+
+Results are written as JSON tagged with the git commit; compare two runs
+with `benchmarks.compare`:
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --output candidate.json
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+# Placeholders take precedence over a local `.env`, so no setting points
+# the run at a real deployment.
+for _name, _value in {
+    "GOOGLE_API_KEY": "benchmark",
+    "VOYAGE_API_KEY": "benchmark",
+    "MONGO_DB_NAME": "benchmark",
+    "MONGO_COLLECTION_NAME": "listings",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx
+from bson import json_util
+
+from benchmarks import serialization
+from benchmarks.concurrency import percentile
+from benchmarks.fixtures import sample_listing
+from benchmarks.stubs import (
+    FakeGenaiClient,
+    FakeVoyageClient,
+    InMemoryCollection,
+    fake_embedding,
+    install_stubs,
+)
+from server.common.utils import query_embedding_cache
+from server.search.generate_embeddings import build_text
+
+SEARCH_QUERIES = [
+    "quiet apartment in Porto with wifi",
+    "sunny beach house with a pool in Barcelona",
+    "modern loft near nightlife in New York",
+    "family friendly condominium in Sydney with a kitchen",
+    "historic flat with a terrace in Istanbul",
+    "central serviced apartment in Hong Kong near the metro",
+    "spacious house with garden and free parking",
+    "cozy private room walking distance to restaurants",
+]
+
+
+def git_sha() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def seed_documents(count: int, embedded: bool = True) -> List[Dict[str, Any]]:
+    """Sample listings, with fake embeddings when `embedded` is set."""
+    docs = []
+    for i in range(count):
+        doc = sample_listing(i, num_reviews=5)
+        if embedded:
+            doc["embedding"] = fake_embedding(build_text(doc))
+        docs.append(doc)
+    return docs
+
+
+async def make_collection(docs: List[Dict[str, Any]], args, name: str):
+    """A fresh collection seeded with `docs`: in memory, or on `--mongo-uri`."""
+    if not args.mongo_uri:
+        return InMemoryCollection(docs, latency_ms=args.db_latency_ms, name=name)
+    from pymongo import AsyncMongoClient
+
+    collection = AsyncMongoClient(args.mongo_uri)[args.mongo_database][name]
+    await collection.drop()
+    if docs:
+        await collection.insert_many(copy.deepcopy(docs))
+    return collection
+
+
+async def timed_requests(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Issue `total` requests with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "errors": errors,
+        "requests_per_second": total / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def bench_search(http: httpx.AsyncClient, args) -> Dict[str, Any]:
+    """`/search` latency; the first pass misses every cache, the second hits them."""
+    async def send(i: int) -> httpx.Response:
+        suffix = "" if warm else f" {i}"
+        return await http.post("/search", json={
+            "user_query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)] + suffix,
+            "similarity_threshold": 0.0,
+        })
+
+    query_embedding_cache.clear()
+    warm = False
+    cold = await timed_requests(send, args.requests, args.concurrency)
+    warm = True
+    for i in range(len(SEARCH_QUERIES)):
+        await send(i)
+    return {"cold": cold, "warm": await timed_requests(send, args.requests, args.concurrency)}
+
+
+async def bench_crud(http: httpx.AsyncClient, args) -> Dict[str, Any]:
+    """Throughput of each CRUD endpoint against the seeded documents."""
+    ids = [sample_listing(i)["_id"] for i in range(args.documents)]
+    new_docs = [
+        json.loads(json_util.dumps({"id": str(90000000 + i), **{
+            k: v for k, v in sample_listing(args.documents + i, num_reviews=5).items()
+            if k != "_id"
+        }}))
+        for i in range(args.requests)
+    ]
+
+    async def get(i):
+        return await http.get(f"/documents/{ids[i % len(ids)]}")
+
+    async def put(i):
+        return await http.put(f"/documents/{ids[i % len(ids)]}", json={"name": f"Renamed listing {i}"})
+
+    async def post(i):
+        return await http.post("/documents", json=new_docs[i])
+
+    async def delete(i):
+        return await http.delete(f"/documents/{new_docs[i]['id']}")
+
+    report = {}
+    for name, send in (("get", get), ("put", put), ("post", post), ("delete", delete)):
+        report[name] = await timed_requests(send, args.requests, args.concurrency)
+    return report
+
+
+async def bench_embedding(args) -> Dict[str, Any]:
+    """`embed_batch_of_documents` over documents that have no embedding yet."""
+    from server.search.generate_embeddings import embed_batch_of_documents
+
+    collection = await make_collection(seed_documents(args.documents, embedded=False), args, "embedding_benchmark")
+    start = time.perf_counter()
+    result = await embed_batch_of_documents(
+        collection,
+        batch_size=args.embed_batch_size,
+        concurrency=args.embed_concurrency,
+        requests_per_minute=1e9,
+        tokens_per_minute=1e12,
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": result["documents_embedded"],
+        "failed": result["documents_failed"],
+        "documents_per_second": result["documents_embedded"] / elapsed,
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    genai_client = FakeGenaiClient(latency_ms=args.embed_latency_ms)
+    voyage_client = FakeVoyageClient(latency_ms=args.rerank_latency_ms)
+    collection = await make_collection(seed_documents(args.documents), args, "listings")
+    install_stubs(collection, genai_client, voyage_client)
+
+    from server.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as http:
+        if "search" in args.scenarios:
+            results["search"] = await bench_search(http, args)
+        if "crud" in args.scenarios:
+            results["crud"] = await bench_crud(http, args)
+    if "embedding" in args.scenarios:
+        results["embedding"] = await bench_embedding(args)
+    if "serialization" in args.scenarios:
+        results["serialization"] = serialization.run(seed_documents(10, embedded=False))
+    results["calls"] = {"embed": genai_client.models.calls, "rerank": voyage_client.calls}
+    return results
+
+
+SCENARIOS = ("search", "crud", "embedding", "serialization")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--documents", type=int, default=500, help="Listings seeded into the collection.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per HTTP scenario.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="In-memory collection round trip.")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    parser.add_argument("--rerank-latency-ms", type=float, default=80.0)
+    parser.add_argument("--embed-batch-size", type=int, default=50)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--mongo-uri", help="Use a real mongod instead of the in-memory collection.")
+    parser.add_argument("--mongo-database", default="benchmark")
+    parser.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    report = {
+        "git_sha": git_sha(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "mongo_uri")},
+        "backend": "mongod" if args.mongo_uri else "in-memory",
+        "results": asyncio.run(run(args)),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,80 @@
+"""Microbenchmark for response serialization of listing documents.
+
+Compares the old `json.loads(json_util.dumps(...))` round trip followed by
+FastAPI's `JSONResponse` rendering against the one-pass `BSONJSONResponse`,
+on single listings (`GET /documents/{id}`) and on search-sized result sets.
+Also checks that both produce identical bytes.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --listings-file listings.ndjson
+"""
+
+import argparse
+import json
+import time
+import timeit
+from typing import Any, Callable, Dict, List
+
+from bson import json_util
+from fastapi.responses import JSONResponse
+
+from benchmarks.fixtures import load_listings
+from server.common.responses import BSONJSONResponse
+
+
+def round_trip_render(content: Any) -> bytes:
+    """What the handlers did before: dumps, loads, then render again."""
+    return JSONResponse(json.loads(json_util.dumps(content))).body
+
+
+def one_pass_render(content: Any) -> bytes:
+    return BSONJSONResponse(content).body
+
+
+def time_per_call(fn: Callable[[Any], bytes], content: Any, min_seconds: float = 0.5) -> float:
+    """Best-of-5 seconds per call."""
+    timer = timeit.Timer(lambda: fn(content), timer=time.perf_counter)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def run(listings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    payloads = {
+        "single_listing": {"document": listings[0]},
+        "search_results": {
+            "num_results": min(len(listings), 10),
+            "results": [{**doc, "score": 0.8, "rerank_score": 0.7} for doc in listings[:10]],
+        },
+    }
+    report = {}
+    for name, content in payloads.items():
+        old, new = round_trip_render(content), one_pass_render(content)
+        if old != new:
+            raise AssertionError(f"{name}: BSONJSONResponse output differs from json_util round trip")
+        old_s = time_per_call(round_trip_render, content)
+        new_s = time_per_call(one_pass_render, content)
+        report[name] = {
+            "bytes": len(new),
+            "round_trip_us": old_s * 1e6,
+            "one_pass_us": new_s * 1e6,
+            "speedup": old_s / new_s if new_s else None,
+        }
+        print(
+            f"{name:>15}: {len(new):>8} bytes  round trip {old_s * 1e6:9.1f}us  "
+            f"one pass {new_s * 1e6:9.1f}us  speedup {old_s / new_s:5.2f}x"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings-file", help="NDJSON export of real listings.")
+    parser.add_argument("--from-mongo", action="store_true", help="Read listings from the configured collection.")
+    parser.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    report = run(load_listings(10, path=args.listings_file, from_mongo=args.from_mongo))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
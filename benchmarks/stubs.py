@@ -0,0 +1,394 @@
+"""Local stand-ins for MongoDB, Gemini and Voyage used by the benchmark suite.
+
+Each stand-in has a configurable per-call latency so benchmarks can model a
+remote dependency without a network:
+
+- `InMemoryCollection`: the subset of the async pymongo collection API the
+  app uses (find/find_one/insert/update/delete/bulk_write/count).
+- `FakeGenaiClient`: deterministic embeddings behind `models.embed_content`
+  and `aio.models.embed_content`, as used by `gemini_embed_documents`.
+- `FakeVoyageClient`: token-overlap scores behind `rerank`.
+
+`install_stubs` patches them into the app modules.
+"""
+
+import asyncio
+import copy
+import hashlib
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from bson.decimal128 import Decimal128
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from server.common.vectors import EMBEDDING_DIMENSIONS
+
+_MISSING = object()
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return _MISSING
+    return doc
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _comparable(value: Any) -> Any:
+    # Decimal128 has no ordering; compare prices as Decimal like MongoDB does.
+    return value.to_decimal() if isinstance(value, Decimal128) else value
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    value, operand = _comparable(value), _comparable(operand)
+    values = value if isinstance(value, list) else [value]
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$eq":
+        return operand in values or value == operand
+    if op == "$ne":
+        return not _compare(value, "$eq", operand)
+    if op == "$in":
+        return any(_compare(value, "$eq", item) for item in operand)
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$all":
+        return all(item in values for item in operand)
+    checks = {
+        "$gt": lambda a, b: a > b,
+        "$gte": lambda a, b: a >= b,
+        "$lt": lambda a, b: a < b,
+        "$lte": lambda a, b: a <= b,
+    }
+    if op in checks:
+        return any(
+            v is not _MISSING and v is not None and checks[op](v, operand)
+            for v in values
+        )
+    raise NotImplementedError(f"Operator {op} is not supported by the in-memory collection")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """Evaluate a MongoDB query filter against a document."""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            value = _get_path(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(_get_path(doc, key), "$eq", condition):
+            return False
+    return True
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection (no `$meta` support)."""
+    if not projection:
+        return copy.deepcopy(doc)
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(not v for v in fields.values()):
+        result = copy.deepcopy(doc)
+        for path in fields:
+            _unset_path(result, path)
+        if not include_id:
+            result.pop("_id", None)
+        return result
+
+    result = {"_id": doc["_id"]} if include_id and "_id" in doc else {}
+    for path in fields:
+        value = _get_path(doc, path)
+        if value is not _MISSING:
+            _set_path(result, path, copy.deepcopy(value))
+    return result
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any]) -> bool:
+    before = copy.deepcopy(doc)
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported")
+    return doc != before
+
+
+class InMemoryCursor:
+    """Async cursor over a snapshot of matching documents."""
+
+    def __init__(self, collection: "InMemoryCollection", query, projection, limit: int = 0):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._limit = limit
+        self._sort = None
+        self._skip = 0
+        self._results = None
+
+    def sort(self, key: str, direction: int = 1) -> "InMemoryCursor":
+        self._sort = (key, direction)
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    async def _load(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            await self._collection._delay()
+            docs = [doc for doc in self._collection._docs.values() if matches(doc, self._query)]
+            if self._sort:
+                key, direction = self._sort
+                docs.sort(key=lambda d: _get_path(d, key), reverse=direction < 0)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [project(doc, self._projection) for doc in docs]
+        return self._results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self._load():
+            yield doc
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = await self._load()
+        return list(results if length is None else results[:length])
+
+
+class InMemoryDatabase(dict):
+    """Collections by name, created on first access with the same latency."""
+
+    name = "benchmark"
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__()
+        self.latency_ms = latency_ms
+
+    def __missing__(self, name: str) -> "InMemoryCollection":
+        self[name] = InMemoryCollection(latency_ms=self.latency_ms, name=name)
+        self[name].database = self
+        return self[name]
+
+
+class InMemoryCollection:
+    """Async, in-memory stand-in for a pymongo collection.
+
+    Args:
+        docs: Initial documents.
+        latency_ms: Simulated round-trip time added to every operation.
+    """
+
+    def __init__(self, docs: Iterable[Dict[str, Any]] = (), latency_ms: float = 0.0, name: str = "listings"):
+        self.name = name
+        self.latency_ms = latency_ms
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        for doc in docs:
+            self._docs[doc["_id"]] = copy.deepcopy(doc)
+        self.database = InMemoryDatabase(latency_ms)
+
+    async def _delay(self) -> None:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    def find(self, filter=None, projection=None, limit: int = 0, batch_size: int = 0, **kwargs) -> InMemoryCursor:
+        return InMemoryCursor(self, filter, projection, limit)
+
+    async def find_one(self, filter=None, projection=None):
+        results = await InMemoryCursor(self, filter, projection, limit=1).to_list()
+        return results[0] if results else None
+
+    async def count_documents(self, filter) -> int:
+        await self._delay()
+        return sum(1 for doc in self._docs.values() if matches(doc, filter))
+
+    async def estimated_document_count(self) -> int:
+        await self._delay()
+        return len(self._docs)
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error: _id {doc['_id']!r}", code=11000)
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return doc["_id"]
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        await self._delay()
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True):
+        await self._delay()
+        inserted, errors = [], []
+        for idx, doc in enumerate(docs):
+            try:
+                inserted.append(self._insert(doc))
+            except DuplicateKeyError as e:
+                errors.append({"index": idx, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted)
+
+    def _update(self, filter, update, upsert: bool = False):
+        for doc in self._docs.values():
+            if matches(doc, filter):
+                return 1, int(_apply_update(doc, update))
+        if upsert:
+            doc = {k: v for k, v in filter.items() if not k.startswith("$")}
+            _apply_update(doc, update)
+            self._insert(doc)
+        return 0, 0
+
+    async def update_one(self, filter, update, upsert: bool = False):
+        await self._delay()
+        matched, modified = self._update(filter, update, upsert)
+        return SimpleNamespace(matched_count=matched, modified_count=modified)
+
+    async def find_one_and_update(self, filter, update, projection=None, return_document=False, upsert: bool = False):
+        await self._delay()
+        for doc in self._docs.values():
+            if matches(doc, filter):
+                before = project(doc, projection)
+                _apply_update(doc, update)
+                # ReturnDocument.AFTER is True, BEFORE is False.
+                return project(doc, projection) if return_document else before
+        if upsert:
+            self._update(filter, update, upsert=True)
+            if return_document:
+                return project(self._docs[filter["_id"]], projection)
+        return None
+
+    async def delete_one(self, filter):
+        await self._delay()
+        for doc_id, doc in list(self._docs.items()):
+            if matches(doc, filter):
+                del self._docs[doc_id]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def bulk_write(self, requests, ordered: bool = True):
+        await self._delay()
+        matched = modified = 0
+        for request in requests:
+            m, n = self._update(request._filter, request._doc, bool(request._upsert))
+            matched += m
+            modified += n
+        return SimpleNamespace(matched_count=matched, modified_count=modified)
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Deterministic pseudo-embedding: texts sharing words get similar vectors."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vector += np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class _FakeModels:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def _embed(self, contents):
+        self.calls += 1
+        texts = [contents] if isinstance(contents, str) else contents
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_embedding(t)) for t in texts])
+
+    def embed_content(self, model=None, contents=None, config=None):
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(contents)
+
+
+class _FakeAsyncModels:
+    def __init__(self, models: _FakeModels):
+        self._models = models
+
+    async def embed_content(self, model=None, contents=None, config=None):
+        await asyncio.sleep(self._models.latency_ms / 1000)
+        return self._models._embed(contents)
+
+
+class FakeGenaiClient:
+    """Stand-in for `genai.Client` with deterministic embeddings."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.models = _FakeModels(latency_ms)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self.models))
+
+
+class FakeVoyageClient:
+    """Stand-in for `voyageai.AsyncClient` that scores by word overlap."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def rerank(self, query: str, documents: List[str], model: str = None, top_k: int = None):
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        query_words = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for idx, document in enumerate(documents):
+            words = set(re.findall(r"\w+", document.lower()))
+            scored.append((len(query_words & words) / (len(query_words) or 1), idx))
+        scored.sort(reverse=True)
+        return SimpleNamespace(results=[
+            SimpleNamespace(index=idx, relevance_score=score)
+            for score, idx in scored[:top_k]
+        ])
+
+
+def install_stubs(collection, genai_client: FakeGenaiClient, voyage_client: FakeVoyageClient) -> None:
+    """Point the app's module-level clients and collections at the stand-ins."""
+    from server import main
+    from server.common import utils
+    from server.search import local_index, search_index
+
+    # Taken by get_genai_client / get_voyage_client instead of real clients.
+    utils._client = genai_client
+    search_index._voyage_client = voyage_client
+    search_index._listings_collection = lambda: collection
+    # The in-memory collection has no $vectorSearch; search the local index.
+    search_index.SEARCH_BACKEND = "local"
+    local_index._index = None
+    main.collection = collection
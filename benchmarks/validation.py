@@ -0,0 +1,76 @@
+"""Benchmark for listing validation throughput.
+
+Validates batches of listings the way `POST /documents/bulk` receives them
+(Extended JSON, as parsed from JSONL) and with native BSON types, comparing
+a per-record `model_validate` loop against the list-level `validate_listings`.
+
+    python -m benchmarks.validation --count 5000
+"""
+
+import argparse
+import gc
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from bson import json_util
+
+from benchmarks.fixtures import load_listings
+from server.common.models import AirBnbListingRequest, validate_listings
+
+
+def as_request(doc: Dict[str, Any]) -> Dict[str, Any]:
+    record = dict(doc)
+    record["id"] = record.pop("_id")
+    return record
+
+
+def per_record(records: List[Dict[str, Any]]) -> None:
+    for record in records:
+        AirBnbListingRequest.model_validate(record)
+
+
+def list_level(records: List[Dict[str, Any]]) -> None:
+    validate_listings(records)
+
+
+def docs_per_second(fn: Callable[[List[Dict[str, Any]]], None], records: List[Dict[str, Any]], repeat: int) -> float:
+    """Best-of-`repeat` validation throughput."""
+    best = float("inf")
+    for _ in range(repeat):
+        # Keep garbage from earlier runs from being collected inside this one.
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn(records)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return len(records) / best
+
+
+def run(count: int, repeat: int, listings_file: str = None) -> Dict[str, Any]:
+    native = [as_request(doc) for doc in load_listings(count, path=listings_file)]
+    extended_json = [json.loads(json_util.dumps(record)) for record in native]
+    report = {}
+    for input_name, records in (("extended_json", extended_json), ("native_bson", native)):
+        for method_name, fn in (("per_record", per_record), ("list_level", list_level)):
+            rate = docs_per_second(fn, records, repeat)
+            report[f"{input_name}.{method_name}"] = {"docs_per_sec": rate}
+            print(f"{input_name:>14} {method_name:>10}: {rate:12,.0f} docs/sec")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--listings-file", help="NDJSON export of real listings.")
+    parser.add_argument("--output", help="Optional path to write results as JSON.")
+    args = parser.parse_args()
+
+    report = run(args.count, args.repeat, args.listings_file)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,6 @@
+"""Airbnb listings search service."""
+
+from dotenv import load_dotenv
+
+# Loaded once, before any module reads its settings from the environment.
+load_dotenv()
@@ -1,40 +1,141 @@
-"""Database Module."""
+"""Database Module.
+
+Clients are created on first use, so importing the app needs no database.
+Pool settings come from the environment:
+
+- `MONGO_MAX_POOL_SIZE` (default 100) and `MONGO_MIN_POOL_SIZE` (default 0):
+  connections per server kept by each client.
+- `MONGO_WAIT_QUEUE_TIMEOUT_MS`: how long an operation waits for a free
+  connection before failing; unset waits for the server selection timeout.
+- `MONGO_COMPRESSORS`: comma-separated wire compressors in order of
+  preference, e.g. `zstd,zlib` (`zstd` needs the `zstandard` package).
+"""
 
 import certifi
-import os 
+import os
+from typing import Any, Dict, Optional
 
-from dotenv import load_dotenv
-from pymongo import MongoClient
+from bson.decimal128 import Decimal128
+from pymongo import AsyncMongoClient, MongoClient
 
 from server.common.logging import logger
 
-load_dotenv()
+MONGO_CLIENT_URL = os.getenv("MONGO_CLIENT_URI")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS")
+
+# Write counter kept on every listing. Each write that changes the document
+# `$inc`s it, so it identifies a version of the document (used for ETags).
+VERSION_FIELD = "_version"
+
+# Double copy of the Decimal128 `price`. Vector index filter fields do not
+# cover Decimal128, so price filters run on this mirror; every write that
+# sets `price` sets it too.
+PRICE_VALUE_FIELD = "price_value"
+
+
+def price_value(price: Any) -> Optional[float]:
+    """`price` as a float for `PRICE_VALUE_FIELD`, or None when unset."""
+    if price is None:
+        return None
+    if isinstance(price, Decimal128):
+        return float(price.to_decimal())
+    return float(price)
+
+
+def with_price_value(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Set `PRICE_VALUE_FIELD` on a document or `$set` payload that sets `price`."""
+    value = price_value(doc.get("price"))
+    if value is not None:
+        doc[PRICE_VALUE_FIELD] = value
+    return doc
+
+_client = None
+_async_client = None
+
+
+def client_options() -> dict:
+    """Keyword arguments shared by the sync and async clients."""
+    options = {
+        "tls": True,
+        "tlsCAFile": certifi.where(),
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+    }
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = int(MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+def get_client() -> MongoClient:
+    """The process-wide sync client, created on first use."""
+    global _client
+    if _client is None:
+        try:
+            _client = MongoClient(MONGO_CLIENT_URL, **client_options())
+            logger.info("Connected to MongoDB successfully.")
+        except Exception as e:
+            logger.error("MongoDB Connection Failed.")
+            raise RuntimeError("Unexpected error accessing MongoDB client.") from e
+    return _client
 
-try:
-    MONGO_CLIENT_URL = os.getenv("MONGO_CLIENT_URI")
-    client = MongoClient(
-        MONGO_CLIENT_URL,
-        tls=True,
-        tlsCAFile=certifi.where(), 
-    )
-    logger.info("Connected to MongoDB successfully.")
-except Exception as e:
-    logger.error("MongoDB Connection Failed.")
-    raise RuntimeError("Unexpected error accessing MongoDB client.") from e
+
+def get_async_client() -> AsyncMongoClient:
+    """The process-wide async client, created on first use."""
+    global _async_client
+    if _async_client is None:
+        try:
+            _async_client = AsyncMongoClient(MONGO_CLIENT_URL, **client_options())
+            logger.info("Connected to MongoDB (async) successfully.")
+        except Exception as e:
+            logger.error("MongoDB Async Connection Failed.")
+            raise RuntimeError("Unexpected error accessing MongoDB client.") from e
+    return _async_client
+
+
+async def close_clients() -> None:
+    """Close whichever clients were created."""
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _client is not None:
+        _client.close()
+        _client = None
 
 
 def get_collection(database_name: str, collection_name: str):
     """Get collection from MongoDB.
-    
+
     Args:
-        database_name (str): Database of MongoDB cluster. 
-        collection_name (str): Collection name. 
+        database_name (str): Database of MongoDB cluster.
+        collection_name (str): Collection name.
     """
     try:
-        db = client[database_name]
+        db = get_client()[database_name]
         collection = db[collection_name]
         logger.info("MongoDB Connection to Collection Successful.")
         return collection
     except Exception as e:
         logger.info("MongoDB Connection to Collection Failed.")
         raise RuntimeError("Unexpected error accessing MongoDB collection.") from e
+
+
+def get_async_collection(database_name: str, collection_name: str):
+    """Get collection from the async MongoDB client.
+
+    Args:
+        database_name (str): Database of MongoDB cluster.
+        collection_name (str): Collection name.
+    """
+    try:
+        collection = get_async_client()[database_name][collection_name]
+        logger.info("MongoDB Async Connection to Collection Successful.")
+        return collection
+    except Exception as e:
+        logger.info("MongoDB Async Connection to Collection Failed.")
+        raise RuntimeError("Unexpected error accessing MongoDB collection.") from e
@@ -0,0 +1,239 @@
+"""Persistent, content-addressed embedding store.
+
+Embeddings are keyed by (model, dimensionality, sha256 of the embedded text)
+in a local SQLite file, so re-running a backfill after a restore, or against
+a copy of the collection, only pays Gemini for texts it has never seen.
+Least recently used entries are evicted beyond `EMBEDDING_STORE_MAX_ENTRIES`.
+
+Enable with `EMBEDDING_STORE_PATH`. The file is opened in WAL mode, so the
+backfill's worker processes and the API can share it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from server.common.logging import get_logger
+from server.common.vectors import EMBEDDING_DIMENSIONS
+
+logger = get_logger("embedding_store")
+
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH")
+EMBEDDING_STORE_MAX_ENTRIES = int(os.getenv("EMBEDDING_STORE_MAX_ENTRIES", "1000000"))
+# Rows written between exact counts, so writes from other processes sharing
+# the file are caught too.
+EMBEDDING_STORE_RECOUNT_EVERY = int(os.getenv("EMBEDDING_STORE_RECOUNT_EVERY", "10000"))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """SQLite-backed embedding cache with LRU eviction.
+
+    Vectors are stored as float32 blobs (3 KB at 768 dimensions). The row
+    count is estimated in memory (every put counted as new) and only
+    re-counted once the estimate passes `max_entries`, or every
+    `EMBEDDING_STORE_RECOUNT_EVERY` rows.
+
+    Args:
+        path: SQLite file; created if missing.
+        max_entries: Entries kept before the least recently used are evicted.
+        model: Embedding model the vectors come from.
+        dimensions: Output dimensionality requested from the model.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = EMBEDDING_STORE_MAX_ENTRIES,
+        model: Optional[str] = None,
+        dimensions: int = EMBEDDING_DIMENSIONS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.model = model or os.getenv("EMBEDDING_MODEL") or ""
+        self.dimensions = dimensions
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                UNIQUE (model, dimensions, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._size_estimate = self._count()
+        self._written_since_count = 0
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Stored vectors for the given text hashes; misses are left out."""
+        hashes = list(dict.fromkeys(hashes))
+        if not hashes:
+            return {}
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                    (self.model, self.dimensions, *chunk),
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, self.model, self.dimensions, key) for key in found],
+                )
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store `(text_hash, vector)` pairs, then evict beyond `max_entries`."""
+        now = time.time()
+        rows = [
+            (self.model, self.dimensions, key, np.asarray(values, dtype=np.float32).tobytes(), now)
+            for key, values in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._size_estimate += len(rows)
+            self._written_since_count += len(rows)
+            if (
+                self._size_estimate <= self.max_entries
+                and self._written_since_count < EMBEDDING_STORE_RECOUNT_EVERY
+            ):
+                return
+            size = self._count()
+            self._written_since_count = 0
+            excess = size - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+                size = self.max_entries
+            self._size_estimate = size
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process."""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[EmbeddingStore] = None
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """The process-wide store, opened on first use; None unless configured."""
+    global _store
+    if _store is None and EMBEDDING_STORE_PATH:
+        _store = EmbeddingStore(EMBEDDING_STORE_PATH)
+        logger.info(f"Opened embedding store {EMBEDDING_STORE_PATH} with {len(_store)} vectors")
+    return _store
+
+
+def plan_embeddings(
+    texts: List[str],
+    store: Optional[EmbeddingStore],
+) -> Tuple[List[str], Dict[str, List[float]], List[str]]:
+    """Split a batch into stored vectors and the distinct texts left to embed.
+
+    Returns the hash of every text, the stored vectors by hash, and each
+    missing text once, however often it occurs in the batch.
+    """
+    hashes = [text_hash(text) for text in texts]
+    found = store.get_many(hashes) if store is not None else {}
+    missing: Dict[str, str] = {}
+    for key, text in zip(hashes, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    return hashes, found, list(missing.values())
+
+
+def complete_embeddings(
+    hashes: List[str],
+    found: Dict[str, List[float]],
+    missing: List[str],
+    embeddings: Optional[List[Any]],
+    store: Optional[EmbeddingStore],
+) -> Optional[List[List[float]]]:
+    """Merge freshly embedded `missing` texts with `found`, in input order.
+
+    `embeddings` is the API response for `missing` (objects with `values`);
+    new vectors are written to the store. Returns None if the request failed.
+    """
+    if missing:
+        if not embeddings or len(embeddings) != len(missing):
+            return None
+        new = {text_hash(text): list(embedding.values) for text, embedding in zip(missing, embeddings)}
+        if store is not None:
+            store.put_many(new.items())
+        found = {**found, **new}
+    return [found[key] for key in hashes]
+
+
+def embed_texts(
+    texts: List[str],
+    embed_fn: Callable[[List[str]], Optional[List[Any]]],
+    store: Optional[EmbeddingStore] = None,
+) -> Optional[List[List[float]]]:
+    """Embed texts through the store with a sync embedding function.
+
+    Args:
+        texts: Texts to embed, in order.
+        embed_fn: Function with the `gemini_embed_documents` interface.
+        store: Embedding store; None only deduplicates within the batch.
+    """
+    hashes, found, missing = plan_embeddings(texts, store)
+    embeddings = embed_fn(missing) if missing else []
+    return complete_embeddings(hashes, found, missing, embeddings, store)
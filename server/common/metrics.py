@@ -0,0 +1,138 @@
+"""Prometheus metrics and per-request stage timings.
+
+Wrap a unit of work in `timed(stage)` to record it in the
+`app_stage_duration_seconds` histogram and in the current request's
+`Server-Timing` header. `MetricsMiddleware` collects the timings of each
+request, sets the header and records `app_request_duration_seconds`.
+Metrics are exposed in the Prometheus text format by `GET /metrics`.
+
+With several worker processes, set `PROMETHEUS_MULTIPROC_DIR` so `/metrics`
+aggregates across them.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Seconds; covers cache hits (sub-millisecond) up to slow remote calls.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+STAGE_LATENCY = Histogram(
+    "app_stage_duration_seconds",
+    "Time spent in one stage of a request (embedding, search, rerank, DB, encoding).",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "app_request_duration_seconds",
+    "Time to the first response byte, by route.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+RERANK_FALLBACKS = Counter(
+    "app_rerank_fallbacks_total",
+    "Searches whose reranker failed or was skipped, by what was used instead.",
+    ["fallback"],
+)
+EMBED_FAILURES = Counter(
+    "app_embed_failures_total",
+    "Embedding requests that failed.",
+    ["source"],
+)
+CIRCUIT_STATE = Gauge(
+    "app_circuit_state",
+    "Circuit breaker state per dependency: 0 closed, 1 open, 2 half open.",
+    ["dependency"],
+)
+
+# Stage timings of the current request, in milliseconds. Tasks spawned by
+# the request copy the context, so they add to the same dict.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as `stage`.
+
+    Repeated stages within one request add up, e.g. several DB calls.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage timings as a `Server-Timing` header value."""
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, and its content type."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware adding `Server-Timing` headers and request latency metrics.
+
+    Plain ASGI rather than `BaseHTTPMiddleware`, so streaming responses
+    pass through untouched and the per-request cost stays small.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                timings["total"] = elapsed * 1000
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing_header(timings).encode("latin-1")),
+                ]
+                # The router stores the matched route in the scope; label by
+                # its template so document IDs do not become label values.
+                route = scope.get("route")
+                REQUEST_LATENCY.labels(
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(message["status"]),
+                ).observe(elapsed)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
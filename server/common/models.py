@@ -1,19 +1,63 @@
 """Pydantic Data models."""
 
-from datetime import datetime
+import os
+from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 from bson.decimal128 import Decimal128
-from pydantic import BaseModel
+from pydantic import (
+    BaseModel,
+    Field,
+    GetCoreSchemaHandler,
+    GetJsonSchemaHandler,
+    TypeAdapter,
+    ValidationError,
+    model_validator
+)
+from pydantic_core import core_schema
+
+# Most searches accepted in one `/search/batch` request. Queries are
+# embedded `EMBEDDING_BATCH_LIMIT` at a time, so offline jobs can send
+# thousands.
+MAX_BATCH_SEARCHES = int(os.getenv("MAX_BATCH_SEARCHES", "2000"))
 
 
 class Decimal128Field:
-    """Custom type for Decimal 128 type."""
+    """Custom type for Decimal 128 type.
+
+    Native `Decimal128` values are accepted by an instance check in
+    pydantic-core; other inputs go through `validate`. JSON serialization
+    emits Extended JSON, Python dumps keep `Decimal128` for MongoDB.
+    """
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler):
+        return core_schema.union_schema(
+            [
+                core_schema.is_instance_schema(Decimal128),
+                core_schema.no_info_plain_validator_function(cls.validate),
+            ],
+            mode="left_to_right",
+            custom_error_type="decimal128_type",
+            custom_error_message="Value must be Decimal128, Decimal, str, int, or float",
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialize, when_used="json"
+            ),
+        )
+
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-        yield cls.serialize
+    def __get_pydantic_json_schema__(cls, schema, handler: GetJsonSchemaHandler):
+        return {
+            "anyOf": [
+                {"type": "number"},
+                {"type": "string"},
+                {
+                    "type": "object",
+                    "properties": {"$numberDecimal": {"type": "string"}},
+                    "required": ["$numberDecimal"],
+                },
+            ]
+        }
 
     @classmethod
     def validate(cls, v, field=None):
@@ -21,10 +65,12 @@ class Decimal128Field:
             return v
         if isinstance(v, dict) and "$numberDecimal" in v:
             return Decimal128(v["$numberDecimal"])
-        if isinstance(v, (str, float, int, Decimal)):
-            return Decimal128(str(v))
-        print(v)
-        raise TypeError("Value must be Decimal128, Decimal, str, int, or float")
+        if isinstance(v, (str, float, int, Decimal)) and not isinstance(v, bool):
+            try:
+                return Decimal128(str(v))
+            except (ArithmeticError, ValueError) as e:
+                raise ValueError(f"Invalid decimal value: {v!r}") from e
+        raise ValueError("Value must be Decimal128, Decimal, str, int, or float")
 
     @classmethod
     def serialize(cls, v, field=None):
@@ -34,24 +80,56 @@ class Decimal128Field:
     
     
 class BsonDateTimeField:
-    """Custom type for Datetime field."""
+    """Custom type for Datetime field.
+
+    Native `datetime` values are accepted by an instance check in
+    pydantic-core; Extended JSON and ISO strings go through `validate`.
+    """
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-        yield cls.serialize
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler):
+        return core_schema.union_schema(
+            [
+                core_schema.is_instance_schema(datetime),
+                core_schema.no_info_plain_validator_function(cls.validate),
+            ],
+            mode="left_to_right",
+            custom_error_type="bson_datetime_type",
+            custom_error_message="Value must be datetime or Extended JSON with $date",
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialize, when_used="json"
+            ),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler: GetJsonSchemaHandler):
+        return {
+            "anyOf": [
+                {"type": "string", "format": "date-time"},
+                {
+                    "type": "object",
+                    "properties": {"$date": {"type": "string", "format": "date-time"}},
+                    "required": ["$date"],
+                },
+            ]
+        }
 
     @classmethod
     def validate(cls, v, field=None):
         # Already datetime
         if isinstance(v, datetime):
             return v
-        # Extended JSON: {"$date": "..."}
-        if isinstance(v, dict) and "$date" in v:
-            return datetime.fromisoformat(v["$date"].replace("Z", "+00:00"))
-        # Plain string
-        if isinstance(v, str):
-            return datetime.fromisoformat(v.replace("Z", "+00:00"))
-        raise TypeError(f"{field.name if field else 'Value'} must be datetime or Extended JSON with $date")
+        try:
+            # Extended JSON: {"$date": "..."} or canonical {"$date": {"$numberLong": "..."}}
+            if isinstance(v, dict) and "$date" in v:
+                v = v["$date"]
+                if isinstance(v, dict) and "$numberLong" in v:
+                    return datetime.fromtimestamp(int(v["$numberLong"]) / 1000, tz=timezone.utc)
+            # Plain string
+            if isinstance(v, str):
+                return datetime.fromisoformat(v.replace("Z", "+00:00"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid datetime value: {v!r}") from e
+        raise ValueError("Value must be datetime or Extended JSON with $date")
 
     @classmethod
     def serialize(cls, v, field=None):
@@ -116,6 +194,40 @@ class AirBnbListingRequest(BaseModel):
     security_deposit: Optional[Decimal128Field] = None
     
     
+# Validates a whole batch of listings in one pydantic-core call.
+listings_adapter = TypeAdapter(List[AirBnbListingRequest])
+
+
+def validate_listings(
+    records: List[Any]
+) -> Tuple[List[Tuple[int, AirBnbListingRequest]], Dict[int, List[Dict[str, Any]]]]:
+    """Validate a batch of raw listings.
+
+    Returns `(index, listing)` pairs for the valid records and the errors of
+    the invalid ones keyed by their index in `records`. A clean batch costs a
+    single validation pass; otherwise the valid records are validated again
+    without the failing ones.
+
+    Args:
+        records: Raw listing dicts, e.g. parsed from a JSONL upload.
+    """
+    try:
+        return list(enumerate(listings_adapter.validate_python(records))), {}
+    except ValidationError as e:
+        errors: Dict[int, List[Dict[str, Any]]] = {}
+        for error in e.errors(include_url=False):
+            idx, *loc = error["loc"]
+            errors.setdefault(idx, []).append({
+                "loc": loc,
+                "msg": error["msg"],
+                "type": error["type"],
+            })
+
+    valid_idx = [i for i in range(len(records)) if i not in errors]
+    valid = listings_adapter.validate_python([records[i] for i in valid_idx])
+    return list(zip(valid_idx, valid)), errors
+
+
 class AirBnbListingUpdate(BaseModel):
     """Model for updating a document in Airbnb listings."""
     name: Optional[str] = None
@@ -129,9 +241,41 @@ class AirBnbListingUpdate(BaseModel):
 
 class BatchEmbedRequest(BaseModel):
     """Batch embeddings API request."""
-    batch_size: Optional[int] = 50
+    batch_size: Optional[int] = Field(50, ge=1)
+    concurrency: Optional[int] = Field(None, ge=1)
+    requests_per_minute: Optional[float] = Field(None, gt=0)
+    tokens_per_minute: Optional[float] = Field(None, gt=0)
     
     
+class NumberRange(BaseModel):
+    """Inclusive numeric range; either bound may be left out."""
+    gte: Optional[float] = None
+    lte: Optional[float] = None
+
+    @model_validator(mode="after")
+    def check_bounds(self):
+        if self.gte is None and self.lte is None:
+            raise ValueError("Range needs gte, lte or both")
+        if self.gte is not None and self.lte is not None and self.gte > self.lte:
+            raise ValueError("Range gte must not exceed lte")
+        return self
+
+
+class SearchFilters(BaseModel):
+    """Listing filters applied inside the vector search, before ranking.
+
+    A string matches one value, a list any of its values. `amenities`
+    matches listings that have all of the given amenities.
+    """
+    price: Optional[NumberRange] = None
+    accommodates: Optional[NumberRange] = None
+    bedrooms: Optional[NumberRange] = None
+    property_type: Optional[Union[str, List[str]]] = None
+    room_type: Optional[Union[str, List[str]]] = None
+    country: Optional[Union[str, List[str]]] = None
+    amenities: Optional[List[str]] = None
+
+
 class SearchRequest(BaseModel):
     user_query: str
     num_candidates: Optional[int] = 150
@@ -140,3 +284,18 @@ class SearchRequest(BaseModel):
     return_full_documents: Optional[bool] = True
     similarity_threshold: Optional[float] = 0.6
     reviews_rating: Optional[int] = None
+    filters: Optional[SearchFilters] = None
+    # "voyage", "local" or "auto"; defaults to RERANKER.
+    reranker: Optional[Literal["voyage", "local", "auto"]] = None
+    two_phase: Optional[bool] = True
+    hybrid: Optional[bool] = False
+    stream: Optional[bool] = False
+    # Milliseconds for embed, search and rerank; defaults to SEARCH_LATENCY_BUDGET_MS.
+    latency_budget_ms: Optional[int] = Field(None, ge=1)
+
+
+class BatchSearchRequest(BaseModel):
+    """Batch search API request."""
+    searches: List[SearchRequest] = Field(max_length=MAX_BATCH_SEARCHES)
+    max_concurrency: int = Field(8, ge=1)
+    rerank_concurrency: int = Field(4, ge=1)
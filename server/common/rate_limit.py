@@ -0,0 +1,62 @@
+"""Rate limiting for quota-bound API calls."""
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """Token-bucket limiter for requests per minute and tokens per minute.
+
+    Callers await `acquire` with the number of tokens a request will
+    consume; the call returns once both buckets have capacity.
+
+    Args:
+        requests_per_minute (float): Maximum requests started per minute.
+        tokens_per_minute (float): Maximum tokens sent per minute.
+
+    Raises:
+        ValueError: A rate is not positive.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Rate limits must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60
+        self._updated_at = now
+        self._request_allowance = min(
+            self.requests_per_minute,
+            self._request_allowance + elapsed_minutes * self.requests_per_minute,
+        )
+        self._token_allowance = min(
+            self.tokens_per_minute,
+            self._token_allowance + elapsed_minutes * self.tokens_per_minute,
+        )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request and `tokens` tokens are available."""
+        # A single request larger than the bucket could otherwise never run.
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._request_allowance >= 1 and self._token_allowance >= tokens:
+                    self._request_allowance -= 1
+                    self._token_allowance -= tokens
+                    return
+                request_wait = (1 - self._request_allowance) / self.requests_per_minute * 60
+                token_wait = (tokens - self._token_allowance) / self.tokens_per_minute * 60
+                await asyncio.sleep(max(request_wait, token_wait, 0.01))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a text (about four characters per token)."""
+    return max(1, len(text) // 4)
@@ -0,0 +1,210 @@
+"""Deadlines, circuit breakers and hedged calls for remote dependencies.
+
+A `Deadline` carries a request's latency budget through its stages; each
+stage waits at most `deadline.timeout(stage_cap)`. A `CircuitBreaker` stops
+calling a dependency after repeated failures and lets one trial call through
+once `reset_seconds` have passed. `hedged` starts a second copy of a slow
+call and keeps whichever finishes first.
+
+Stage failures surface as `DependencyError`, or `DeadlineExceeded` once the
+request budget is spent, so the API can tell them apart from bad input.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from server.common.metrics import CIRCUIT_STATE
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+
+class DependencyError(RuntimeError):
+    """A remote dependency failed, timed out or is short-circuited.
+
+    Args:
+        stage (str): Stage that failed, e.g. `embed` or `rerank`.
+        message (str): What went wrong.
+    """
+
+    def __init__(self, stage: str, message: str):
+        super().__init__(f"{stage}: {message}")
+        self.stage = stage
+
+
+class DeadlineExceeded(DependencyError):
+    """The request's latency budget ran out during `stage`."""
+
+
+class Deadline:
+    """Absolute point in time by which a request must finish.
+
+    Args:
+        budget_ms (float): Total latency budget, in milliseconds.
+    """
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, stage_cap: Optional[float] = None) -> float:
+        """Seconds a stage may take: what is left, capped at `stage_cap`."""
+        remaining = self.remaining()
+        return remaining if stage_cap is None else min(remaining, stage_cap)
+
+
+def stage_timeout(deadline: Optional[Deadline], stage_cap: Optional[float]) -> Optional[float]:
+    """Timeout for a stage with or without a deadline; None waits forever."""
+    return deadline.timeout(stage_cap) if deadline is not None else stage_cap
+
+
+async def run_stage(
+    stage: str,
+    call: Awaitable[Any],
+    timeout: Optional[float],
+    deadline: Optional[Deadline] = None,
+) -> Any:
+    """Await `call` for at most `timeout` seconds.
+
+    Raises `DeadlineExceeded` if the request budget ran out and
+    `DependencyError` on a per-stage timeout.
+    """
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        if deadline is not None and deadline.remaining() == 0:
+            raise DeadlineExceeded(stage, "latency budget exhausted") from None
+        raise DependencyError(stage, f"timed out after {timeout * 1000:.0f} ms") from None
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and `allow` returns False for `reset_seconds`. Then it is half
+    open: one trial call is allowed, and its outcome closes or re-opens it.
+    Callers `release` a trial they abandon; one never resolved is given up
+    after another `reset_seconds`.
+
+    Args:
+        name (str): Dependency name, used as the metrics label.
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_seconds (float): Time open before a trial call is allowed.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuits = 0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may be made now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_seconds:
+                self._set_state(self.HALF_OPEN)
+            trial_expired = now - self._trial_started_at >= self.reset_seconds
+            if self.state == self.HALF_OPEN and (not self._trial_in_flight or trial_expired):
+                self._trial_in_flight = True
+                self._trial_started_at = now
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """Give up a call without counting it, e.g. when the request ran out of budget."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+        }
+
+
+async def hedged(
+    call: Callable[[], Awaitable[Any]],
+    hedge_after: Optional[float],
+    max_attempts: int = 2,
+) -> Any:
+    """Run `call`, starting another copy each time it is slow or fails.
+
+    A new copy starts when none has finished within `hedge_after` seconds,
+    or as soon as one fails, up to `max_attempts` copies in total. The first
+    copy to succeed wins and the rest are cancelled; if all fail, the last
+    error is raised. With `hedge_after` None, `call` runs once.
+
+    Args:
+        call: Factory for the coroutine to run.
+        hedge_after: Seconds to wait before starting the next copy.
+        max_attempts: Maximum copies started.
+    """
+    if not hedge_after or max_attempts <= 1:
+        return await call()
+
+    tasks = {asyncio.ensure_future(call())}
+    started = 1
+    error: Optional[BaseException] = None
+    try:
+        while tasks:
+            timeout = hedge_after if started < max_attempts else None
+            done, tasks = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if started < max_attempts:
+                tasks.add(asyncio.ensure_future(call()))
+                started += 1
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
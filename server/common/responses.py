@@ -0,0 +1,31 @@
+"""Response classes."""
+
+import json
+from typing import Any
+
+from bson import json_util
+from fastapi.responses import JSONResponse
+
+from server.common.metrics import timed
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSON response that encodes BSON types in a single pass.
+
+    Equivalent to returning `json.loads(json_util.dumps(content))`, which
+    builds a string, parses it back into Python objects and lets FastAPI
+    serialize them again. Here `ObjectId`, `Decimal128`, `datetime` and the
+    other BSON types are converted to relaxed Extended JSON by
+    `json_util.default` while the standard encoder writes the bytes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return json.dumps(
+                content,
+                default=json_util.default,
+                ensure_ascii=False,
+                allow_nan=False,
+                indent=None,
+                separators=(",", ":"),
+            ).encode("utf-8")
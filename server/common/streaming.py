@@ -0,0 +1,24 @@
+"""Streaming response helpers."""
+
+from typing import Any, AsyncIterable, AsyncIterator, Dict
+
+from bson import json_util
+
+from server.common.logging import logger
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def ndjson_stream(docs: AsyncIterable[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode documents as newline-delimited Extended JSON, one line per document.
+
+    Documents are pulled from `docs` only as the client consumes the
+    response, so a slow reader also slows the underlying cursor.
+    """
+    try:
+        async for doc in docs:
+            yield (json_util.dumps(doc) + "\n").encode("utf-8")
+    except Exception:
+        # Headers are already sent; all we can do is log and end the stream.
+        logger.exception("Error while streaming documents.")
+        raise
@@ -1,29 +1,198 @@
 """Utility Functions."""
 
 import os
-from typing import Any, List 
+from typing import Any, Dict, List, Optional, Tuple
 
-from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from server.common.cache import TTLCache
 from server.common.logging import logger
+from server.common.metrics import EMBED_FAILURES, timed
+from server.common.resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceeded,
+    DependencyError,
+    hedged,
+    run_stage,
+    stage_timeout
+)
+from server.common.vectors import EMBEDDING_DIMENSIONS
 
-load_dotenv()
+_client: Optional[genai.Client] = None
 
-client = genai.Client(vertexai=False)
+# Maximum number of texts per Gemini embed_content request.
+EMBEDDING_BATCH_LIMIT = 100
+
+# Longest a query embedding may take, within the request's latency budget.
+EMBED_TIMEOUT_MS = float(os.getenv("EMBED_TIMEOUT_MS", "800"))
+# Start a second, hedged embedding request when the first has not answered
+# after this long. Unset disables hedging.
+EMBED_HEDGE_AFTER_MS = float(os.getenv("EMBED_HEDGE_AFTER_MS", "0"))
+
+# Fails query embeddings fast while Gemini is unhealthy.
+gemini_breaker = CircuitBreaker("gemini")
+
+# Query embeddings keyed by (normalized query, model, dimensionality).
+query_embedding_cache = TTLCache(
+    max_size=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+def get_genai_client() -> genai.Client:
+    """The process-wide Gemini client, created on first use."""
+    global _client
+    if _client is None:
+        _client = genai.Client(vertexai=False)
+    return _client
+
+
+def embed_content(texts: List[str]) -> List[Any]:
+    """Embed a batch of texts with the sync Gemini client.
+
+    Unlike `gemini_embed_documents`, API errors are raised so callers
+    can back off on quota errors.
+    """
+    with timed("embed"):
+        result = get_genai_client().models.embed_content(
+            model=os.getenv("EMBEDDING_MODEL"),
+            contents=texts,
+            config=types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS),
+        )
+    return result.embeddings
 
 
 def gemini_embed_documents(texts: List[str]) -> List[Any]:
     """Embed a batch of texts."""
     try:
-        # client = genai.Client(vertexai=False)
-        result = client.models.embed_content(
+        return embed_content(texts)
+    except Exception as e:
+        EMBED_FAILURES.labels("documents").inc()
+        logger.error(f"Error embedding batch of docs! {e}")
+
+
+async def async_embed_content(texts: List[str]) -> List[Any]:
+    """Embed a batch of texts with the async Gemini client.
+
+    Unlike `async_gemini_embed_documents`, API errors are raised so callers
+    can back off on quota errors.
+    """
+    with timed("embed"):
+        result = await get_genai_client().aio.models.embed_content(
             model=os.getenv("EMBEDDING_MODEL"),
             contents=texts,
-            config=types.EmbedContentConfig(output_dimensionality=768),
+            config=types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS),
         )
-        return result.embeddings
+    return result.embeddings
+
+
+async def async_gemini_embed_documents(texts: List[str]) -> List[Any]:
+    """Embed a batch of texts with the async Gemini client."""
+    try:
+        return await async_embed_content(texts)
     except Exception as e:
+        EMBED_FAILURES.labels("query").inc()
         logger.error(f"Error embedding batch of docs! {e}")
-        
\ No newline at end of file
+
+
+def normalize_query(text: str) -> str:
+    """Normalize a query so trivially different strings share a cache entry."""
+    return " ".join(text.lower().split())
+
+
+def _query_cache_key(user_query: str):
+    return (
+        normalize_query(user_query),
+        os.getenv("EMBEDDING_MODEL"),
+        EMBEDDING_DIMENSIONS,
+    )
+
+
+async def embed_query(user_query: str, deadline: Optional[Deadline] = None) -> List[float]:
+    """Embed a single search query, served from the query cache when possible.
+
+    The Gemini call is bounded by `EMBED_TIMEOUT_MS` and the request
+    `deadline`, optionally hedged, and skipped while `gemini_breaker` is open.
+
+    The normalized query is embedded, so the vector always matches its
+    cache key. Cached vectors are stored as tuples and returned as new lists.
+
+    Args:
+        user_query (str): Natural language search query.
+        deadline (Deadline): Latency budget of the request, if any.
+
+    Raises:
+        DependencyError: The embedding failed, timed out or was short-circuited.
+    """
+    key = _query_cache_key(user_query)
+    cached = query_embedding_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    text = key[0]
+
+    if not gemini_breaker.allow():
+        raise DependencyError("embed", "Gemini circuit breaker is open")
+    try:
+        embeddings = await run_stage(
+            "embed",
+            hedged(lambda: async_embed_content([text]), EMBED_HEDGE_AFTER_MS / 1000),
+            stage_timeout(deadline, EMBED_TIMEOUT_MS / 1000),
+            deadline
+        )
+    except DeadlineExceeded:
+        gemini_breaker.release()
+        raise
+    except Exception as e:
+        gemini_breaker.record_failure()
+        EMBED_FAILURES.labels("query").inc()
+        logger.error(f"Error embedding search query! {e}")
+        if isinstance(e, DependencyError):
+            raise
+        raise DependencyError("embed", str(e)) from e
+    except BaseException:
+        # Cancelled, e.g. the client disconnected: free a half-open trial.
+        gemini_breaker.release()
+        raise
+    gemini_breaker.record_success()
+
+    values = tuple(embeddings[0].values)
+    query_embedding_cache.set(key, values)
+    return list(values)
+
+
+async def embed_queries(user_queries: List[str]) -> List[Optional[List[float]]]:
+    """Embed many search queries with as few Gemini calls as possible.
+
+    Cached queries are served from the query cache; the remaining distinct
+    normalized queries are embedded in requests of up to
+    `EMBEDDING_BATCH_LIMIT` texts. Each query gets its own list; queries whose
+    request failed come back as None.
+
+    Args:
+        user_queries (List[str]): Natural language search queries.
+    """
+    keys = [_query_cache_key(query) for query in user_queries]
+    vectors: Dict[Any, Optional[Tuple[float, ...]]] = {}
+    to_embed: Dict[Any, str] = {}
+    for key in keys:
+        if key in vectors or key in to_embed:
+            continue
+        cached = query_embedding_cache.get(key)
+        if cached is not None:
+            vectors[key] = cached
+        else:
+            to_embed[key] = key[0]
+
+    pending = list(to_embed.items())
+    for start in range(0, len(pending), EMBEDDING_BATCH_LIMIT):
+        chunk = pending[start:start + EMBEDDING_BATCH_LIMIT]
+        embeddings = await async_gemini_embed_documents([query for _, query in chunk])
+        for i, (key, _) in enumerate(chunk):
+            values = tuple(embeddings[i].values) if embeddings else None
+            vectors[key] = values
+            if values is not None:
+                query_embedding_cache.set(key, values)
+
+    return [list(vectors[key]) if vectors.get(key) is not None else None for key in keys]
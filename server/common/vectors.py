@@ -0,0 +1,79 @@
+"""Embedding storage formats.
+
+`EMBEDDING_STORAGE` selects how vectors are written to MongoDB:
+
+- `array` (default): BSON array of doubles, ~9 bytes per dimension.
+- `float32`: packed float32 BSON binary vector, 4 bytes per dimension.
+- `int8`: scalar-quantized int8 BSON binary vector, 1 byte per dimension.
+
+Atlas Vector Search indexes all three with the same `vector` field definition.
+"""
+
+import os
+from typing import Any, List, Union
+
+import bson
+import numpy as np
+from bson.binary import Binary, BinaryVectorDtype
+
+EMBEDDING_DIMENSIONS = 768
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "array")
+STORAGE_FORMATS = ("array", "float32", "int8")
+
+
+def quantize_int8(values: Any) -> List[int]:
+    """Scale a vector into int8 range.
+
+    Each vector gets its own scale factor; cosine similarity ignores scale,
+    so only rounding error is introduced.
+    """
+    vector = np.asarray(values, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+    if max_abs == 0:
+        return [0] * vector.size
+    return np.round(vector * (127.0 / max_abs)).astype(np.int8).tolist()
+
+
+def encode_embedding(values: Any, storage: str = EMBEDDING_STORAGE) -> Union[List[float], Binary]:
+    """Encode embedding values in the configured storage format.
+
+    Args:
+        values: Embedding values as returned by Gemini.
+        storage: One of `array`, `float32` or `int8`.
+    """
+    if storage == "float32":
+        return Binary.from_vector(list(values), BinaryVectorDtype.FLOAT32)
+    if storage == "int8":
+        return Binary.from_vector(quantize_int8(values), BinaryVectorDtype.INT8)
+    if storage == "array":
+        return list(values)
+    raise ValueError(f"Unknown embedding storage format: {storage}")
+
+
+def encode_query_vector(values: Any, storage: str = EMBEDDING_STORAGE) -> Union[List[float], Binary]:
+    """Encode a query vector to match how documents are stored."""
+    return encode_embedding(values, storage)
+
+
+def decode_embedding(stored: Any) -> List[float]:
+    """Stored embedding (array or binary vector) back to a list of numbers."""
+    if isinstance(stored, Binary):
+        return stored.as_vector().data
+    return list(stored)
+
+
+def embedding_bson_size(embedding: Any) -> int:
+    """Bytes the `embedding` field takes up inside a BSON document."""
+    return len(bson.encode({"embedding": embedding})) - len(bson.encode({}))
+
+
+def storage_format(stored: Any) -> str:
+    """Storage format of an embedding as read from MongoDB."""
+    if isinstance(stored, Binary):
+        dtype = stored.as_vector().dtype
+        if dtype == BinaryVectorDtype.FLOAT32:
+            return "float32"
+        if dtype == BinaryVectorDtype.INT8:
+            return "int8"
+        return str(dtype)
+    return "array"
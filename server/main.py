@@ -1,51 +1,197 @@
 """Main entrypoint for runner."""
-import json 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from typing import Optional
 
 from bson import json_util
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
-from pymongo.errors import PyMongoError
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 
-from server.common.db import get_collection
+from server.common.db import (
+    MONGO_MIN_POOL_SIZE,
+    VERSION_FIELD,
+    close_clients,
+    get_async_collection,
+    with_price_value
+)
+from server.common.embedding_store import get_embedding_store
 from server.common.logging import logger
+from server.common.metrics import MetricsMiddleware, metrics_payload, timed
+from server.common.resilience import DeadlineExceeded, DependencyError
+from server.common.responses import BSONJSONResponse
+from server.common.streaming import NDJSON_MEDIA_TYPE, ndjson_stream
+from server.common.utils import embed_query, query_embedding_cache
 from server.common.models import (
     AirBnbListingRequest, 
     AirBnbListingUpdate, 
     BatchEmbedRequest,
-    SearchRequest
+    BatchSearchRequest,
+    SearchRequest,
+    validate_listings
 )
 from server.search.generate_embeddings import embed_batch_of_documents
-from server.search.search_index import create_search_index, get_search_results
-
-# Load env variables. 
-load_dotenv()
+from server.search.local_index import SEARCH_BACKEND, get_local_index, loaded_local_index, save_local_index
+from server.search.result_cache import invalidate_search_results, result_cache, wait_for_version_bumps
+from server.search.search_index import (
+    create_search_index,
+    create_text_search_index,
+    get_batch_search_results,
+    breaker_stats,
+    get_search_results,
+    rerank_stats,
+    stream_search_results
+)
+from server.search.tuning import load_search_tuning, tuned_search_params
 
+# Records validated and inserted per insert_many call on bulk uploads.
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+# MongoDB duplicate key error.
+DUPLICATE_KEY_ERROR = 11000
 
 DB_NAME = os.getenv("MONGO_DB_NAME")
 COLLECTION_NAME = os.getenv("MONGO_COLLECTION_NAME")
 
+# Open pool connections and prime the query path before serving traffic.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "apartment with wifi")
 
-app = FastAPI()
+# Set by the lifespan handler on startup.
+collection = None
+
+
+async def warmup(collection) -> None:
+    """Open `MONGO_MIN_POOL_SIZE` connections and embed a sample query.
+
+    Failures are logged rather than raised so a slow dependency does not
+    keep the worker from starting.
+    """
+    try:
+        db = collection.database
+        await asyncio.gather(*(db.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))))
+        logger.info("Warmup: MongoDB connection pool ready.")
+    except Exception as e:
+        logger.warning(f"Warmup: MongoDB ping failed: {e}")
+    try:
+        await embed_query(WARMUP_QUERY)
+        logger.info("Warmup: query embedding path ready.")
+    except DependencyError as e:
+        logger.warning(f"Warmup: query embedding failed: {e}")
+    if SEARCH_BACKEND == "local":
+        await get_local_index(collection)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the DB collection and load search tuning, optionally warm up; close clients on shutdown."""
+    global collection
+    if collection is None:
+        try:
+            collection = get_async_collection(DB_NAME, COLLECTION_NAME)
+        except RuntimeError as e:
+            logger.error(f"Database access failed: {e}")
+            raise
+    load_search_tuning()
+    if WARMUP_ON_STARTUP:
+        await warmup(collection)
+    yield
+    await save_local_index(force=True)
+    await wait_for_version_bumps()
+    await close_clients()
 
-# Connect to MongoDB client. 
-try:
-    collection = get_collection(DB_NAME, COLLECTION_NAME)
-except RuntimeError as e:
-    logger.error(f"Database access failed: {e}")
-    raise HTTPException(
-        status_code=500, 
-        detail="Internal server error - DB access failed."
-    )
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
     
     
+# Operators that run JavaScript on the server.
+SERVER_SIDE_JS_OPERATORS = {"$where", "$function", "$accumulator"}
+
+
+def find_server_side_js(value) -> Optional[str]:
+    """First `SERVER_SIDE_JS_OPERATORS` key at any depth of a query, or None."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in SERVER_SIDE_JS_OPERATORS:
+                return key
+            found = find_server_side_js(item)
+            if found:
+                return found
+    elif isinstance(value, list):
+        for item in value:
+            found = find_server_side_js(item)
+            if found:
+                return found
+    return None
+
+
+# Declared before /documents/{doc_id} so "export" is not read as an ID.
+@app.get("/documents/export")
+async def export_documents(
+    filter: Optional[str] = Query(None, description="Extended JSON query filter."),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return."),
+    limit: int = Query(0, ge=0, description="Maximum documents; 0 for no limit."),
+    batch_size: int = Query(500, ge=1, le=10000),
+):
+    """Stream listings as NDJSON.
+
+    Documents are read from the cursor one batch at a time as the client
+    consumes the response, so memory stays flat for any result size.
+    """
+    try:
+        query = json_util.loads(filter) if filter else {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+    if not isinstance(query, dict):
+        raise HTTPException(status_code=400, detail="Filter must be a JSON object")
+    operator = find_server_side_js(query)
+    if operator:
+        raise HTTPException(status_code=400, detail=f"Operator {operator} is not allowed in filters")
+
+    if fields:
+        projection = {field.strip(): 1 for field in fields.split(",") if field.strip()}
+    else:
+        projection = {"embedding": 0}
+
+    cursor = collection.find(query, projection, limit=limit, batch_size=batch_size)
+    return StreamingResponse(ndjson_stream(cursor), media_type=NDJSON_MEDIA_TYPE)
+
+
+def document_etag(doc: dict) -> str:
+    """Strong ETag for a stored listing, from its write counter."""
+    return f'"{doc.get(VERSION_FIELD, 0)}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Whether an `If-None-Match` header value matches `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"3" matches "3".
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
 @app.get("/documents/{doc_id}")
-def get_document(doc_id: str):
-    """Search for Airbnb Listings."""
+async def get_document(
+    doc_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Search for Airbnb Listings.
+
+    Responses carry an `ETag`; a request whose `If-None-Match` still matches
+    gets a 304 after reading only the version field.
+    """
     try:
-        doc = collection.find_one({"_id": doc_id})
+        if if_none_match:
+            with timed("db_find"):
+                current = await collection.find_one({"_id": doc_id}, {VERSION_FIELD: 1})
+            if current and etag_matches(document_etag(current), if_none_match):
+                return Response(status_code=304, headers={"ETag": document_etag(current)})
+        with timed("db_find"):
+            doc = await collection.find_one({"_id": doc_id})
         logger.info(f"Found document with ID: {doc_id}")
     except Exception as exc:
         logger.exception("MongoDB error on find_one")
@@ -54,21 +200,16 @@ def get_document(doc_id: str):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    return json.loads(json_util.dumps({"document": doc}))
+    return BSONJSONResponse({"document": doc}, headers={"ETag": document_etag(doc)})
 
 
 @app.delete("/documents/{doc_id}")
-def delete_document(doc_id: str):
+async def delete_document(doc_id: str):
     """Delete document from collection."""
     logger.info(f"Request to delete document with ID: {doc_id}")
     try:
-        doc = collection.find_one({"_id": doc_id})
-        if not doc:
-            logger.error(f"Document not found with ID: {doc_id}")
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        collection.delete_one({"_id": doc_id})
-        return {"message": "Deleted", "id": doc_id}
+        with timed("db_delete"):
+            result = await collection.delete_one({"_id": doc_id})
     except PyMongoError as e:
         logger.exception(f"Database error during deletion: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -76,36 +217,151 @@ def delete_document(doc_id: str):
         logger.exception(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="Unexpected server error")
 
+    if result.deleted_count == 0:
+        logger.error(f"Document not found with ID: {doc_id}")
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    index = loaded_local_index()
+    if index is not None:
+        index.remove(doc_id)
+        await save_local_index()
+    await invalidate_search_results(collection)
+    return {"message": "Deleted", "id": doc_id}
+
 
 @app.post("/documents")
-def add_listing(request: AirBnbListingRequest):
-    """Add a new listing."""
+async def add_listing(request: AirBnbListingRequest):
+    """Add a new listing.
+
+    Existing IDs are detected by the unique `_id` index on insert rather
+    than looked up first.
+    """
+    doc = with_price_value(request.model_dump())
+    doc["_id"] = doc.pop("id")
+    doc[VERSION_FIELD] = 1
     try:
-        doc = request.model_dump()
-        # Check if document exists. 
-        if doc.get("id"):
-            existing = collection.find_one({"_id": doc["id"]})
-            print(f"EXISTING: {existing}")
-            if existing:
-                raise HTTPException(status_code=400, detail="Document with this ID already exists")
-            
-        # Insert new listing. 
-        doc["_id"] = doc.pop("id")
-        
-        result = collection.insert_one(doc)
+        with timed("db_insert"):
+            result = await collection.insert_one(doc)
         return {"message": "Listing added", "id": str(result.inserted_id)}
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Document with this ID already exists")
     except Exception as e:
         logger.error(f"Error inserting new listing to Airbnb: {e}")
         raise HTTPException(status_code=500, detail=f"Error inserting document: {str(e)}")
 
 
+async def insert_listing_chunk(records, report) -> list:
+    """Validate and insert one chunk of `(line, raw_record)` pairs.
+
+    Duplicate `_id`s are read from the bulk write errors instead of being
+    looked up first. Returns the inserted IDs.
+    """
+    valid, errors = validate_listings([raw for _, raw in records])
+    for idx, error in errors.items():
+        line, raw = records[idx]
+        report["errors"].append({
+            "line": line,
+            "id": raw.get("id") if isinstance(raw, dict) else None,
+            "error": error,
+        })
+
+    docs, lines = [], []
+    for idx, listing in valid:
+        doc = with_price_value(listing.model_dump())
+        doc["_id"] = doc.pop("id")
+        doc[VERSION_FIELD] = 1
+        docs.append(doc)
+        lines.append(records[idx][0])
+
+    if not docs:
+        return []
+
+    failed = set()
+    try:
+        with timed("db_insert"):
+            await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            idx = error["index"]
+            failed.add(idx)
+            if error.get("code") == DUPLICATE_KEY_ERROR:
+                report["duplicates"].append(docs[idx]["_id"])
+            else:
+                report["errors"].append({
+                    "line": lines[idx],
+                    "id": docs[idx]["_id"],
+                    "error": error.get("errmsg"),
+                })
+
+    inserted = [doc["_id"] for i, doc in enumerate(docs) if i not in failed]
+    report["inserted"] += len(inserted)
+    return inserted
+
+
+@app.post("/documents/bulk")
+async def bulk_add_listings(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    embed: bool = Query(False, description="Embed the new listings after inserting."),
+):
+    """Insert listings from a streamed JSONL body, one listing per line.
+
+    The body is read incrementally and written in unordered `insert_many`
+    chunks of `BULK_CHUNK_SIZE`. Invalid records and duplicate IDs are
+    reported per record without failing the rest of the upload.
+    """
+    report = {"received": 0, "inserted": 0, "duplicates": [], "errors": []}
+    inserted_ids = []
+    chunk = []
+    buffer = b""
+    line_number = 0
+
+    def parse_line(raw_line: bytes):
+        nonlocal line_number
+        line_number += 1
+        if not raw_line.strip():
+            return
+        report["received"] += 1
+        try:
+            chunk.append((line_number, json_util.loads(raw_line)))
+        except ValueError as e:
+            report["errors"].append({"line": line_number, "id": None, "error": f"Invalid JSON: {e}"})
+
+    try:
+        async for body_chunk in request.stream():
+            buffer += body_chunk
+            *complete, buffer = buffer.split(b"\n")
+            for raw_line in complete:
+                parse_line(raw_line)
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                inserted_ids += await insert_listing_chunk(chunk, report)
+                chunk = []
+        parse_line(buffer)
+        if chunk:
+            inserted_ids += await insert_listing_chunk(chunk, report)
+    except PyMongoError as e:
+        logger.exception(f"Database error during bulk insert: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if embed and inserted_ids:
+        background_tasks.add_task(
+            embed_batch_of_documents, collection, batch_size=50, ids=inserted_ids
+        )
+        report["embedding_queued"] = len(inserted_ids)
+
+    logger.info(
+        f"Bulk insert: {report['inserted']} inserted, {len(report['duplicates'])} duplicates, "
+        f"{len(report['errors'])} errors"
+    )
+    return BSONJSONResponse(report)
+
+
 @app.put("/documents/{doc_id}")
-def update_document(doc_id: str, request: AirBnbListingUpdate):
-    """Update an existing document in MongoDB."""
-    existing_doc = collection.find_one({"_id": doc_id})
-    if not existing_doc:
-        raise HTTPException(status_code=404, detail="Document not found")
+async def update_document(doc_id: str, request: AirBnbListingUpdate):
+    """Update an existing document in MongoDB.
 
+    Applies the update and reads back the new document in one round trip.
+    """
     # Prepare update fields.
     update_data = {
         k: v for k, v in request.dict(exclude_unset=True).items()
@@ -114,18 +370,32 @@ def update_document(doc_id: str, request: AirBnbListingUpdate):
 
     if not update_data:
         raise HTTPException(status_code=400, detail="No valid fields provided for update")
+    with_price_value(update_data)
 
-    result = collection.update_one({"_id": doc_id}, {"$set": update_data})
-    if result.modified_count == 0:
-        return {"message": "No changes made", "id": doc_id}
+    with timed("db_update"):
+        updated_doc = await collection.find_one_and_update(
+            {"_id": doc_id},
+            {"$set": update_data, "$inc": {VERSION_FIELD: 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+    if not updated_doc:
+        raise HTTPException(status_code=404, detail="Document not found")
 
-    # Return updated document
-    updated_doc = collection.find_one({"_id": doc_id})
-    return json.loads(json_util.dumps({"document": updated_doc}))
+    index = loaded_local_index()
+    if index is not None and "review_scores" in update_data:
+        index.set_review_value(
+            doc_id,
+            update_data["review_scores"].get("review_scores_value"),
+            updated_doc.get(VERSION_FIELD),
+        )
+        await save_local_index()
+    await invalidate_search_results(collection)
+
+    return BSONJSONResponse({"document": updated_doc}, headers={"ETag": document_etag(updated_doc)})
 
 
 @app.post("/documents/batch-embeddings")
-def batch_embed_documents(
+async def batch_embed_documents(
     query_batch_size: int = Query(50, ge=1),
     body: Optional[BatchEmbedRequest] = None
 ):
@@ -135,8 +405,10 @@ def batch_embed_documents(
     embeddings field. 
     """
     batch_size = body.batch_size if body and body.batch_size else query_batch_size
-    result = embed_batch_of_documents(
-        collection, batch_size=batch_size)
+    # Optional pipeline overrides; unset values fall back to the env config.
+    overrides = body.model_dump(exclude_none=True, exclude={"batch_size"}) if body else {}
+    result = await embed_batch_of_documents(
+        collection, batch_size=batch_size, **overrides)
     return result
     
 
@@ -150,27 +422,132 @@ def create_vector_search_index():
     return result
 
 
+@app.post("/search/create-text")
+def create_text_index():
+    """Create the text search index used by hybrid search.
+
+    This is a one time activity for a collection.
+    """
+    result = create_text_search_index(DB_NAME, COLLECTION_NAME)
+    return result
+
+
+@app.post("/search/local-index/reload")
+async def reload_local_index():
+    """Rebuild the in-process vector index from the collection.
+
+    Picks up embeddings written by other processes, e.g. the backfill CLI.
+    """
+    index = await get_local_index(collection, reload=True)
+    return {"vectors": len(index), "dimensions": index.dimensions}
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: stage and request latencies, fallback and failure counts."""
+    payload, content_type = metrics_payload()
+    return Response(payload, media_type=content_type)
+
+
+@app.get("/search/cache-stats")
+def search_cache_stats():
+    """Hit/miss counters for the search caches."""
+    store = get_embedding_store()
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "rerank": rerank_stats(),
+        "search_results": result_cache.stats(),
+        "embedding_store": store.stats() if store is not None else None,
+    }
+
+
+@app.get("/search/breakers")
+def search_breakers():
+    """Circuit breaker state of the embedding and rerank providers."""
+    return breaker_stats()
+
+
+def search_params(request: SearchRequest) -> dict:
+    """Keyword arguments for `get_search_results` from a search request.
+
+    When the client sets neither `num_candidates` nor `limit`, both come
+    from the `SEARCH_TUNING_PATH` file, if one is loaded. Fields the client
+    left unset are then adjusted so `num_candidates >= limit >= top_k`,
+    without overriding the ones it did set.
+    """
+    params = {
+        "user_query": request.user_query,
+        "num_candidates": request.num_candidates,
+        "limit": request.limit,
+        "return_full_documents": request.return_full_documents,
+        "similarity_threshold": request.similarity_threshold,
+        "reviews_rating": request.reviews_rating,
+        "filters": request.filters,
+        "reranker": request.reranker,
+        "top_k": request.top_k,
+        "two_phase": request.two_phase,
+        "hybrid": request.hybrid,
+        "latency_budget_ms": request.latency_budget_ms,
+    }
+    client_set = request.model_fields_set
+    if not client_set & {"num_candidates", "limit"}:
+        params.update(tuned_search_params(request.reviews_rating))
+    if "limit" not in client_set and params["limit"] is not None:
+        params["limit"] = max(params["limit"], params["top_k"] or 0)
+        if "num_candidates" in client_set and params["num_candidates"] is not None:
+            params["limit"] = min(params["limit"], params["num_candidates"])
+    if "num_candidates" not in client_set and params["num_candidates"] is not None:
+        params["num_candidates"] = max(params["num_candidates"], params["limit"] or 0)
+    return params
+
+
 @app.post("/search")
-def search_listings(request: SearchRequest):
+async def search_listings(request: SearchRequest):
     """Search for Airbnb listings."""
     try:
         logger.info(f"Search request: {request.dict()}")
 
-        result = get_search_results(
-            user_query=request.user_query,
-            num_candidates=request.num_candidates,
-            limit=request.limit,
-            return_full_documents=request.return_full_documents,
-            similarity_threshold=request.similarity_threshold,
-            reviews_rating=request.reviews_rating,
-            top_k=request.top_k
-        )
+        if request.stream:
+            results = await stream_search_results(**search_params(request))
+            return StreamingResponse(ndjson_stream(results), media_type=NDJSON_MEDIA_TYPE)
+
+        result = await get_search_results(**search_params(request))
 
-        return json.loads(json_util.dumps(result))
+        return BSONJSONResponse(result)
     except ValueError as ve:
         logger.error(f"Validation error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
 
+    except DeadlineExceeded as de:
+        logger.warning(f"Search ran out of latency budget: {de}")
+        raise HTTPException(status_code=504, detail=str(de))
+
+    except DependencyError as de:
+        logger.error(f"Search dependency unavailable: {de}")
+        raise HTTPException(status_code=503, detail=str(de))
+
     except Exception as e:
         logger.exception("Search failed due to unexpected error.")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.post("/search/batch")
+async def batch_search_listings(request: BatchSearchRequest):
+    """Run many searches in one request.
+
+    All queries are embedded together, then searched and reranked
+    concurrently. Each result has the `/search` shape plus timings.
+    """
+    if not request.searches:
+        raise HTTPException(status_code=400, detail="No searches provided")
+    try:
+        logger.info(f"Batch search request with {len(request.searches)} queries")
+        result = await get_batch_search_results(
+            [search_params(search) for search in request.searches],
+            max_concurrency=request.max_concurrency,
+            rerank_concurrency=request.rerank_concurrency
+        )
+        return BSONJSONResponse(result)
+    except Exception:
+        logger.exception("Batch search failed due to unexpected error.")
+        raise HTTPException(status_code=500, detail="Internal server error")
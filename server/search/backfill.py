@@ -0,0 +1,294 @@
+"""Resumable, sharded embedding backfill.
+
+Splits the collection's `_id` keyspace into shards, walks each shard with
+keyset pagination in its own worker process and checkpoints progress per
+shard, so an interrupted run resumes where it stopped. Documents that fail
+to embed after retrying quota and server errors are written to a
+dead-letter collection and skipped. Each run first sets the numeric
+`price_value` mirror on listings that lack it, for vector search filters.
+
+Usage:
+    python -m server.search.backfill --run-id initial --workers 4 --batch-size 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from server.common.db import PRICE_VALUE_FIELD, VERSION_FIELD, get_collection
+from server.common.embedding_store import complete_embeddings, get_embedding_store, plan_embeddings
+from server.common.logging import get_logger
+from server.common.vectors import encode_embedding
+from server.search.generate_embeddings import build_text, cols_to_embed, content_hash, embed_with_retries
+from server.search.result_cache import bump_write_version
+
+logger = get_logger("backfill")
+
+CHECKPOINT_COLLECTION = os.getenv("BACKFILL_CHECKPOINT_COLLECTION", "embedding_backfill_checkpoints")
+DEAD_LETTER_COLLECTION = os.getenv("BACKFILL_DEAD_LETTER_COLLECTION", "embedding_dead_letter")
+
+
+def plan_shards(collection, num_shards: int) -> List[Dict[str, Any]]:
+    """Split the `_id` keyspace into contiguous, roughly equal ranges.
+
+    Boundaries are found with skips over the `_id` index, so no documents
+    are read. Each shard covers `lower <= _id < upper`; `None` is unbounded.
+
+    Args:
+        collection: Listings collection.
+        num_shards: Number of shards to create.
+    """
+    total = collection.estimated_document_count()
+    boundaries = []
+    for i in range(1, num_shards):
+        boundary = list(
+            collection.find({}, {"_id": 1})
+            .sort("_id", ASCENDING)
+            .skip(total * i // num_shards)
+            .limit(1)
+        )
+        if boundary and boundary[0]["_id"] not in boundaries:
+            boundaries.append(boundary[0]["_id"])
+
+    lowers = [None] + boundaries
+    uppers = boundaries + [None]
+    return [
+        {"shard": i, "lower": lower, "upper": upper}
+        for i, (lower, upper) in enumerate(zip(lowers, uppers))
+    ]
+
+
+def load_or_create_checkpoints(db, run_id: str, collection, num_shards: int) -> List[Dict[str, Any]]:
+    """Return the shard checkpoints for a run, planning them on first use."""
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    existing = list(checkpoints.find({"run_id": run_id}).sort("shard", ASCENDING))
+    if existing:
+        logger.info(f"Resuming run '{run_id}' with {len(existing)} shards")
+        return existing
+
+    shards = plan_shards(collection, num_shards)
+    now = datetime.now(timezone.utc)
+    docs = [
+        {
+            "_id": f"{run_id}:{shard['shard']}",
+            "run_id": run_id,
+            **shard,
+            "last_id": None,
+            "done": False,
+            "embedded": 0,
+            "failed": 0,
+            "updated_at": now,
+        }
+        for shard in shards
+    ]
+    checkpoints.insert_many(docs)
+    logger.info(f"Planned run '{run_id}' with {len(docs)} shards")
+    return docs
+
+
+def _page_filter(checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyset filter for the next page of a shard."""
+    id_range = {}
+    if checkpoint["last_id"] is not None:
+        id_range["$gt"] = checkpoint["last_id"]
+    elif checkpoint["lower"] is not None:
+        id_range["$gte"] = checkpoint["lower"]
+    if checkpoint["upper"] is not None:
+        id_range["$lt"] = checkpoint["upper"]
+
+    query: Dict[str, Any] = {"embedding": {"$exists": False}}
+    if id_range:
+        query["_id"] = id_range
+    return query
+
+
+def dead_letter(db, docs: List[Dict[str, Any]], run_id: str, error: str) -> None:
+    """Record documents that could not be embedded."""
+    now = datetime.now(timezone.utc)
+    db[DEAD_LETTER_COLLECTION].bulk_write(
+        [
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {
+                    "$set": {"run_id": run_id, "error": error, "failed_at": now},
+                    "$inc": {"attempts": 1},
+                },
+                upsert=True,
+            )
+            for doc in docs
+        ],
+        ordered=False,
+    )
+
+
+def run_shard(
+    database_name: str,
+    collection_name: str,
+    run_id: str,
+    shard: int,
+    batch_size: int,
+    min_request_interval: float,
+) -> Dict[str, Any]:
+    """Embed every document of one shard, checkpointing after each page."""
+    collection = get_collection(database_name, collection_name)
+    db = collection.database
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    checkpoint = checkpoints.find_one({"_id": f"{run_id}:{shard}"})
+    projection = {col: 1 for col in cols_to_embed}
+    last_request_at = 0.0
+    store = get_embedding_store()
+
+    while not checkpoint["done"]:
+        docs = list(
+            collection.find(_page_filter(checkpoint), projection)
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not docs:
+            checkpoint = checkpoints.find_one_and_update(
+                {"_id": checkpoint["_id"]},
+                {"$set": {"done": True, "updated_at": datetime.now(timezone.utc)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            break
+
+        # Texts already in the embedding store cost no request.
+        hashes, found, missing = plan_embeddings([build_text(doc) for doc in docs], store)
+        embeddings = []
+        if missing:
+            # Stay under this worker's share of the embedding quota.
+            wait = min_request_interval - (time.monotonic() - last_request_at)
+            if wait > 0:
+                time.sleep(wait)
+            last_request_at = time.monotonic()
+            # 429s are expected with several workers on one quota: back off
+            # before giving up on the page.
+            embeddings = embed_with_retries(missing)
+
+        vectors = complete_embeddings(hashes, found, missing, embeddings, store)
+        embedded = failed = 0
+        if vectors is not None:
+            result = collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"]},
+                        {
+                            "$set": {
+                                "embedding": encode_embedding(values),
+                                "embedding_hash": content_hash(doc),
+                            },
+                            "$inc": {VERSION_FIELD: 1},
+                        },
+                    )
+                    for doc, values in zip(docs, vectors)
+                ],
+                ordered=False,
+            )
+            embedded = result.modified_count
+            bump_write_version(collection)
+        else:
+            dead_letter(db, docs, run_id, "embedding request failed")
+            failed = len(docs)
+
+        checkpoint = checkpoints.find_one_and_update(
+            {"_id": checkpoint["_id"]},
+            {
+                "$set": {"last_id": docs[-1]["_id"], "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"embedded": embedded, "failed": failed},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        logger.info(
+            f"Shard {shard}: embedded {checkpoint['embedded']}, "
+            f"failed {checkpoint['failed']}, last _id {checkpoint['last_id']}"
+        )
+
+    return {
+        "shard": shard,
+        "embedded": checkpoint["embedded"],
+        "failed": checkpoint["failed"],
+    }
+
+
+def backfill_price_values(collection) -> int:
+    """Set `PRICE_VALUE_FIELD` on listings that have a price but no mirror.
+
+    One server-side update; documents written since the mirror existed
+    already carry it, so re-runs only touch stragglers.
+    """
+    result = collection.update_many(
+        {"price": {"$ne": None}, PRICE_VALUE_FIELD: {"$exists": False}},
+        [{"$set": {PRICE_VALUE_FIELD: {"$toDouble": "$price"}}}],
+    )
+    logger.info(f"Set {PRICE_VALUE_FIELD} on {result.modified_count} documents")
+    return result.modified_count
+
+
+def run_backfill(
+    run_id: str,
+    workers: int,
+    batch_size: int,
+    requests_per_minute: float,
+    database_name: Optional[str] = None,
+    collection_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Plan (or resume) a backfill run and process its shards in parallel."""
+    database_name = database_name or os.getenv("MONGO_DB_NAME")
+    collection_name = collection_name or os.getenv("MONGO_COLLECTION_NAME")
+    collection = get_collection(database_name, collection_name)
+    price_values = backfill_price_values(collection)
+    checkpoints = load_or_create_checkpoints(collection.database, run_id, collection, workers)
+
+    pending = [c["shard"] for c in checkpoints if not c["done"]]
+    # The quota is shared, so each worker gets an equal slice of it.
+    min_request_interval = 60.0 * min(workers, max(len(pending), 1)) / requests_per_minute
+
+    # Spawn (not fork) so every worker opens its own MongoClient.
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=min(workers, max(len(pending), 1))) as pool:
+        results = pool.starmap(
+            run_shard,
+            [
+                (database_name, collection_name, run_id, shard, batch_size, min_request_interval)
+                for shard in pending
+            ],
+        )
+
+    summary = {
+        "run_id": run_id,
+        "shards": len(checkpoints),
+        "embedded": sum(r["embedded"] for r in results),
+        "failed": sum(r["failed"] for r in results),
+        "price_values": price_values,
+    }
+    logger.info(f"Backfill finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-id", required=True, help="Checkpoints are stored per run id; reuse it to resume.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "100")),
+    )
+    parser.add_argument("--database", default=None)
+    parser.add_argument("--collection", default=None)
+    args = parser.parse_args()
+
+    run_backfill(
+        run_id=args.run_id,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        requests_per_minute=args.requests_per_minute,
+        database_name=args.database,
+        collection_name=args.collection,
+    )
@@ -1,12 +1,25 @@
 """Generate Emebddings using gemini."""
 
-from typing import Any, Dict 
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
 
+from google.genai import errors
 from pymongo import UpdateOne
 from tqdm import tqdm
 
+from server.common.db import VERSION_FIELD
+from server.common.embedding_store import complete_embeddings, get_embedding_store, plan_embeddings
 from server.common.logging import logger
-from server.common.utils import gemini_embed_documents
+from server.common.metrics import EMBED_FAILURES
+from server.common.rate_limit import AsyncRateLimiter, estimate_tokens
+from server.common.utils import async_embed_content, embed_content
+from server.common.vectors import encode_embedding
+from server.search.local_index import REVIEW_FIELD, loaded_local_index, save_local_index
+from server.search.result_cache import invalidate_search_results
 
 
 cols_to_embed = [
@@ -31,52 +44,244 @@ def build_text(doc: Dict[str, Any]) -> str:
         {col}: {doc.get(col, "")}
         """
     return text.strip()
+
+
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Hash of the embedded text, stored as `embedding_hash` next to the vector.
+
+    Args:
+        doc: Airbnb listing / document.
+    """
+    return hashlib.sha256(build_text(doc).encode("utf-8")).hexdigest()
     
 
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "100"))
+EMBEDDING_TOKENS_PER_MINUTE = float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "30000"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+WRITE_BATCH_SIZE = int(os.getenv("EMBEDDING_WRITE_BATCH_SIZE", "500"))
+
+# Status codes worth retrying: quota exhaustion and transient server errors.
+RETRYABLE_STATUS_CODES = {429, 500, 503}
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, capped at a minute."""
+    return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+def embed_with_retries(
+    texts: List[str],
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Optional[List[Any]]:
+    """Sync form of `embed_with_backoff` for the backfill CLI and re-embed worker.
+
+    Retries 429/5xx responses with backoff and returns None only once the
+    retries run out or on a non-retryable error.
+
+    Args:
+        texts: Texts to embed in a single request.
+        max_retries: Retries for 429/5xx responses before giving up.
+        sleep: Called with each backoff delay.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return embed_content(texts)
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                EMBED_FAILURES.labels("documents").inc()
+                logger.error(f"Error embedding batch of docs! {e}")
+                return None
+            delay = backoff_delay(attempt)
+            logger.warning(f"Embedding request failed with {e.code}, retrying in {delay:.1f}s")
+            sleep(delay)
+        except Exception as e:
+            EMBED_FAILURES.labels("documents").inc()
+            logger.error(f"Error embedding batch of docs! {e}")
+            return None
+
+
+async def embed_with_backoff(
+    texts: List[str],
+    limiter: AsyncRateLimiter,
+    max_retries: int = EMBEDDING_MAX_RETRIES,
+) -> Optional[List[Any]]:
+    """Embed texts within the rate limit, backing off on quota errors.
+
+    Args:
+        texts: Texts to embed in a single request.
+        limiter: Shared limiter for requests and tokens per minute.
+        max_retries: Retries for 429/5xx responses before giving up.
+    """
+    tokens = sum(estimate_tokens(text) for text in texts)
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(tokens)
+        try:
+            return await async_embed_content(texts)
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                EMBED_FAILURES.labels("documents").inc()
+                logger.error(f"Error embedding batch of docs! {e}")
+                return None
+            delay = backoff_delay(attempt)
+            logger.warning(f"Embedding request failed with {e.code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except Exception as e:
+            EMBED_FAILURES.labels("documents").inc()
+            logger.error(f"Error embedding batch of docs! {e}")
+            return None
+
+
 # NOTE: The function below can be used as a pub/sub function -> 
 # Listening to a queue of documentst that get inserted to the 
 # collection. 
-def embed_batch_of_documents(collection, batch_size):
-    """Embed a batch of documents."""
+async def embed_batch_of_documents(
+    collection,
+    batch_size: int,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    requests_per_minute: float = EMBEDDING_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = EMBEDDING_TOKENS_PER_MINUTE,
+    ids: Optional[List[Any]] = None,
+):
+    """Embed every document that does not have an embedding yet.
+
+    Runs as a pipeline so Mongo reads, Gemini calls and Mongo writes overlap:
+    a reader prefetches batches from a single cursor, `concurrency` workers
+    embed them within the requests/tokens per minute quota, and a writer
+    flushes `UpdateOne`s in bulk (and into the local vector index, if loaded).
+    Texts found in the embedding store, or repeated within a batch, are not
+    sent to Gemini.
 
-    # NOTE: Would have used asyncio gather instead but due to Gemini Embeddings quota
-    # used while loop. 
-    total_to_embed = collection.count_documents({"embedding": {"$exists": False}})
+    Args:
+        collection: Async collection holding the listings.
+        batch_size: Documents sent to Gemini per embedding request.
+        concurrency: Number of concurrent embedding workers.
+        requests_per_minute: Embedding request quota.
+        tokens_per_minute: Embedding token quota.
+        ids: Only consider documents with these `_id`s.
+
+    Raises:
+        ValueError: `concurrency` or a rate limit is not positive.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+    query = {"embedding": {"$exists": False}}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    total_to_embed = await collection.count_documents(query)
     logger.info(f"Documents without embedding: {total_to_embed}")
-    
+
+    read_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    store = get_embedding_store()
     documents_embedded = 0
-    
-    with tqdm(total=total_to_embed, desc="Embedding documents", unit="doc") as pbar:
+    documents_failed = 0
+    documents_from_store = 0
+
+    async def reader():
+        # One cursor for the whole run: documents are never fetched twice,
+        # even while earlier batches are still being embedded.
+        projection = {col: 1 for col in cols_to_embed}
+        projection[REVIEW_FIELD] = 1
+        projection[VERSION_FIELD] = 1
+        cursor = collection.find(query, projection=projection, batch_size=batch_size)
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                await read_queue.put(batch)
+                batch = []
+        if batch:
+            await read_queue.put(batch)
+        for _ in range(concurrency):
+            await read_queue.put(None)
+
+    async def embedder():
+        nonlocal documents_failed, documents_from_store
         while True:
-            docs = list(collection.find({"embedding": {"$exists": False}}).limit(batch_size))
-            if not docs:
-                logger.info("No more documents to embed.")
+            docs = await read_queue.get()
+            if docs is None:
                 break
             inputs = [build_text(doc) for doc in docs]
-            embeddings = gemini_embed_documents(inputs)
-            
-            # Store batch updates. 
-            updates = []
-            if embeddings:
-                for doc, embedding in zip(docs, embeddings):
-                    updates.append(
-                        UpdateOne(
-                            {"_id": doc["_id"]},
-                            {"$set": {"embedding": embedding.values}}
-                        )
-                    )
-            if updates: 
-                result = collection.bulk_write(updates, ordered=False)
-                modified_count = result.modified_count
-                documents_embedded += modified_count
-                logger.info(f"Updated {modified_count} documents with embeddings")
-                pbar.update(modified_count)
-
-        
-    count = collection.count_documents({"embedding": {"$exists": True}})
+            hashes, found, missing = await asyncio.to_thread(plan_embeddings, inputs, store)
+            documents_from_store += sum(1 for key in hashes if key in found)
+            embeddings = await embed_with_backoff(missing, limiter) if missing else []
+            vectors = await asyncio.to_thread(
+                complete_embeddings, hashes, found, missing, embeddings, store
+            )
+            if vectors is None:
+                documents_failed += len(docs)
+                continue
+            await write_queue.put(list(zip(docs, vectors)))
+
+    async def writer(pbar):
+        nonlocal documents_embedded
+        pending = []
+
+        async def flush():
+            nonlocal documents_embedded, pending
+            if not pending:
+                return
+            updates = [
+                UpdateOne(
+                    {"_id": doc["_id"]},
+                    {
+                        "$set": {
+                            "embedding": encode_embedding(values),
+                            "embedding_hash": content_hash(doc),
+                        },
+                        "$inc": {VERSION_FIELD: 1},
+                    }
+                )
+                for doc, values in pending
+            ]
+            result = await collection.bulk_write(updates, ordered=False)
+            # Keep an in-process vector index in step with the new vectors.
+            index = loaded_local_index()
+            if index is not None:
+                for doc, values in pending:
+                    review_value = (doc.get("review_scores") or {}).get("review_scores_value")
+                    index.upsert(doc["_id"], values, review_value, doc.get(VERSION_FIELD, 0) + 1)
+                await save_local_index()
+            # New vectors can change any search; new listings only become
+            # searchable here, so inserts alone do not invalidate.
+            await invalidate_search_results(collection)
+            modified_count = result.modified_count
+            documents_embedded += modified_count
+            logger.info(f"Updated {modified_count} documents with embeddings")
+            pbar.update(modified_count)
+            pending = []
+
+        while True:
+            embedded = await write_queue.get()
+            if embedded is None:
+                break
+            pending.extend(embedded)
+            if len(pending) >= WRITE_BATCH_SIZE:
+                await flush()
+        await flush()
+
+    async def produce():
+        await asyncio.gather(reader(), *(embedder() for _ in range(concurrency)))
+        await write_queue.put(None)
+
+    with tqdm(total=total_to_embed, desc="Embedding documents", unit="doc") as pbar:
+        # A failure in any stage cancels the others instead of leaving them
+        # blocked on a full queue.
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            tg.create_task(writer(pbar))
+
+    if documents_failed:
+        logger.error(f"Failed to embed {documents_failed} documents")
+    count = await collection.count_documents({"embedding": {"$exists": True}})
     logger.info(f"Documents with embedding: {count}")
     return {
         "documents_to_embed": total_to_embed,
         "documents_embedded": documents_embedded,
+        "documents_failed": documents_failed,
+        "documents_from_store": documents_from_store,
         "msg": f"Documents updated with embeddings: {count}"
     }
@@ -0,0 +1,324 @@
+"""In-process vector index.
+
+A local stand-in for Atlas `$vectorSearch`: every stored `embedding` lives in
+one contiguous float32 matrix and top-k cosine queries are a single
+matrix-vector product. Useful in dev and CI, and to skip the network hop.
+
+Enable with `SEARCH_BACKEND=local`. Set `LOCAL_INDEX_PATH` to keep a snapshot
+on disk; later startups memory-map it instead of re-reading the collection.
+The snapshot records each document's `_version`, so on load only documents
+added, changed or deleted since it was written are read back.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import json_util
+
+from server.common.db import VERSION_FIELD
+from server.common.logging import get_logger
+from server.common.vectors import decode_embedding
+
+logger = get_logger("local_index")
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "atlas")
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH")
+# Shortest time between snapshot writes after index updates.
+LOCAL_INDEX_SAVE_INTERVAL = float(os.getenv("LOCAL_INDEX_SAVE_INTERVAL", "60"))
+# Past this share of changed documents, a snapshot is rebuilt rather than patched.
+LOCAL_INDEX_MAX_DELTA = float(os.getenv("LOCAL_INDEX_MAX_DELTA", "0.5"))
+
+REVIEW_FIELD = "review_scores.review_scores_value"
+
+
+def _review_value(doc: Dict[str, Any]) -> float:
+    value = (doc.get("review_scores") or {}).get("review_scores_value")
+    return float(value) if value is not None else np.nan
+
+
+def _normalize(vector: Iterable[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class LocalVectorIndex:
+    """Cosine-similarity index over unit-normalized float32 rows.
+
+    Rows are kept in a growable buffer so inserts are amortized O(1);
+    deletes move the last row into the freed slot. `versions` holds the
+    `_version` each row was read at, None when unknown.
+    """
+
+    def __init__(
+        self,
+        ids: List[Any],
+        matrix: np.ndarray,
+        review_values: np.ndarray,
+        versions: Optional[Dict[Any, Optional[int]]] = None,
+    ):
+        self.ids = list(ids)
+        self.id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self.versions = dict(versions or {})
+        # Set by writes, cleared once a snapshot is saved.
+        self.dirty = False
+        # May be a read-only memory map until the first write.
+        self._matrix = matrix
+        self._review_values = review_values
+        self._masks: Dict[float, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dimensions(self) -> int:
+        return self._matrix.shape[1]
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Dict[str, Any]]) -> "LocalVectorIndex":
+        """Build an index from documents carrying `_id`, `embedding` and review scores."""
+        ids, vectors, reviews, versions = [], [], [], {}
+        for doc in docs:
+            ids.append(doc["_id"])
+            vectors.append(_normalize(decode_embedding(doc["embedding"])))
+            reviews.append(_review_value(doc))
+            versions[doc["_id"]] = doc.get(VERSION_FIELD, 0)
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return cls(ids, matrix, np.asarray(reviews, dtype=np.float32), versions)
+
+    @classmethod
+    def load_snapshot(cls, path: str) -> "LocalVectorIndex":
+        """Memory-map a snapshot written by `save_snapshot`."""
+        matrix = np.load(f"{path}.vectors.npy", mmap_mode="r")
+        review_values = np.load(f"{path}.reviews.npy")
+        with open(f"{path}.ids.json") as f:
+            meta = json_util.loads(f.read())
+        if isinstance(meta, list):
+            # Written before versions were recorded: every row is re-checked.
+            return cls(meta, matrix, review_values)
+        return cls(meta["ids"], matrix, review_values, dict(zip(meta["ids"], meta["versions"])))
+
+    def save_snapshot(self, path: str) -> None:
+        """Write the index to `path.*` so it can be memory-mapped at startup.
+
+        Files are written aside and renamed into place, so processes that
+        have the previous snapshot mapped keep reading it intact.
+        """
+        with self._lock:
+            size = len(self.ids)
+            ids = list(self.ids)
+            meta = {"ids": ids, "versions": [self.versions.get(doc_id) for doc_id in ids]}
+            arrays = {
+                "vectors": np.ascontiguousarray(self._matrix[:size]),
+                "reviews": np.array(self._review_values[:size]),
+            }
+            self.dirty = False
+        for name, array in arrays.items():
+            with open(f"{path}.{name}.npy.tmp", "wb") as f:
+                np.save(f, array)
+        with open(f"{path}.ids.json.tmp", "w") as f:
+            f.write(json_util.dumps(meta))
+        for name in ("vectors.npy", "reviews.npy", "ids.json"):
+            os.replace(f"{path}.{name}.tmp", f"{path}.{name}")
+
+    def _review_mask(self, reviews_rating: float) -> np.ndarray:
+        mask = self._masks.get(reviews_rating)
+        if mask is None:
+            mask = self._review_values[:len(self.ids)] >= reviews_rating
+            self._masks[reviews_rating] = mask
+        return mask
+
+    def search(
+        self,
+        query_vector: Iterable[float],
+        limit: int,
+        reviews_rating: Optional[int] = None,
+        allowed_ids: Optional[Iterable[Any]] = None,
+    ) -> List[Tuple[Any, float]]:
+        """Exact top-`limit` neighbours as `(_id, score)` pairs.
+
+        Scores use Atlas' cosine scale, `(1 + cosine) / 2`, so thresholds
+        tuned against `$vectorSearch` carry over. With `allowed_ids`, only
+        those documents are candidates.
+        """
+        with self._lock:
+            size = len(self.ids)
+            if size == 0 or limit <= 0:
+                return []
+            scores = self._matrix[:size] @ _normalize(query_vector)
+            if reviews_rating:
+                scores = np.where(self._review_mask(reviews_rating), scores, -np.inf)
+            if allowed_ids is not None:
+                allowed = np.zeros(size, dtype=bool)
+                allowed[[self.id_to_row[doc_id] for doc_id in allowed_ids if doc_id in self.id_to_row]] = True
+                scores = np.where(allowed, scores, -np.inf)
+
+            limit = min(limit, size)
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (self.ids[row], float((1 + scores[row]) / 2))
+                for row in top
+                if np.isfinite(scores[row])
+            ]
+
+    def _ensure_writable(self, extra_rows: int) -> None:
+        size = len(self.ids)
+        capacity = self._matrix.shape[0]
+        if isinstance(self._matrix, np.memmap) or size + extra_rows > capacity:
+            new_capacity = max(size + extra_rows, capacity * 2, 16)
+            matrix = np.zeros((new_capacity, self._matrix.shape[1]), dtype=np.float32)
+            matrix[:size] = self._matrix[:size]
+            reviews = np.full(new_capacity, np.nan, dtype=np.float32)
+            reviews[:size] = self._review_values[:size]
+            self._matrix, self._review_values = matrix, reviews
+
+    def upsert(
+        self,
+        doc_id: Any,
+        vector: Iterable[float],
+        review_value: Optional[float] = None,
+        version: Optional[int] = None,
+    ) -> None:
+        """Insert or replace the vector for a document at `_version` `version`."""
+        vector = _normalize(vector)
+        with self._lock:
+            if self._matrix.shape[1] == 0:
+                self._matrix = np.zeros((0, vector.shape[0]), dtype=np.float32)
+            self._ensure_writable(1)
+            row = self.id_to_row.get(doc_id)
+            if row is None:
+                row = len(self.ids)
+                self.ids.append(doc_id)
+                self.id_to_row[doc_id] = row
+            self._matrix[row] = vector
+            self._review_values[row] = np.nan if review_value is None else review_value
+            self.versions[doc_id] = version
+            self._masks.clear()
+            self.dirty = True
+
+    def set_review_value(self, doc_id: Any, review_value: Optional[float], version: Optional[int] = None) -> None:
+        """Update the review score used by the rating filter."""
+        with self._lock:
+            row = self.id_to_row.get(doc_id)
+            if row is None:
+                return
+            self._ensure_writable(0)
+            self._review_values[row] = np.nan if review_value is None else review_value
+            self.versions[doc_id] = version
+            self._masks.clear()
+            self.dirty = True
+
+    def remove(self, doc_id: Any) -> None:
+        """Drop a document from the index."""
+        with self._lock:
+            row = self.id_to_row.pop(doc_id, None)
+            if row is None:
+                return
+            self._ensure_writable(0)
+            last = len(self.ids) - 1
+            if row != last:
+                last_id = self.ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._review_values[row] = self._review_values[last]
+                self.ids[row] = last_id
+                self.id_to_row[last_id] = row
+            self.ids.pop()
+            self.versions.pop(doc_id, None)
+            self._masks.clear()
+            self.dirty = True
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_lock = asyncio.Lock()
+_save_lock = asyncio.Lock()
+_saved_at = 0.0
+
+_EMBEDDED_PROJECTION = {"embedding": 1, REVIEW_FIELD: 1, VERSION_FIELD: 1}
+
+
+async def build_from_collection(collection) -> LocalVectorIndex:
+    """Read every embedded document from an async collection into an index."""
+    cursor = collection.find(
+        {"embedding": {"$exists": True}},
+        projection=_EMBEDDED_PROJECTION,
+        batch_size=1000,
+    )
+    docs = [doc async for doc in cursor]
+    index = LocalVectorIndex.from_documents(docs)
+    logger.info(f"Built local vector index with {len(index)} vectors")
+    return index
+
+
+async def sync_with_collection(index: LocalVectorIndex, collection) -> Optional[LocalVectorIndex]:
+    """Apply writes made since `index` was snapshotted.
+
+    Compares `_version`s (no vectors are read) and re-reads only added or
+    changed documents. Returns None when so much changed that a rebuild is
+    cheaper.
+    """
+    cursor = collection.find({"embedding": {"$exists": True}}, projection={VERSION_FIELD: 1}, batch_size=10000)
+    current = {doc["_id"]: doc.get(VERSION_FIELD, 0) async for doc in cursor}
+    changed = [doc_id for doc_id, version in current.items() if index.versions.get(doc_id) != version]
+    deleted = [doc_id for doc_id in index.ids if doc_id not in current]
+    if len(changed) + len(deleted) > LOCAL_INDEX_MAX_DELTA * max(len(current), 1):
+        return None
+    for doc_id in deleted:
+        index.remove(doc_id)
+    for start in range(0, len(changed), 1000):
+        async for doc in collection.find({"_id": {"$in": changed[start:start + 1000]}}, projection=_EMBEDDED_PROJECTION):
+            if "embedding" in doc:
+                index.upsert(doc["_id"], decode_embedding(doc["embedding"]), _review_value(doc), doc.get(VERSION_FIELD, 0))
+    logger.info(f"Synced local vector index snapshot: {len(changed)} changed, {len(deleted)} deleted")
+    return index
+
+
+async def get_local_index(collection, reload: bool = False) -> LocalVectorIndex:
+    """Return the process-wide index, loading it on first use.
+
+    Args:
+        collection: Async listings collection to read embeddings from.
+        reload: Rebuild from the collection even if already loaded.
+    """
+    global _index
+    async with _index_lock:
+        if _index is not None and not reload:
+            return _index
+        path = LOCAL_INDEX_PATH
+        index = None
+        if not reload and path and os.path.exists(f"{path}.vectors.npy"):
+            index = LocalVectorIndex.load_snapshot(path)
+            logger.info(f"Loaded local vector index snapshot with {len(index)} vectors")
+            index = await sync_with_collection(index, collection)
+        if index is None:
+            index = await build_from_collection(collection)
+            index.dirty = True
+        _index = index
+        await save_local_index(force=True)
+        return _index
+
+
+async def save_local_index(force: bool = False) -> None:
+    """Write the snapshot if the index changed, at most once per `LOCAL_INDEX_SAVE_INTERVAL`.
+
+    Call after index updates, and with `force` on shutdown. Writes missed by
+    a crash are recovered by the `_version` sync on the next load.
+    """
+    global _saved_at
+    if _index is None or not _index.dirty or not LOCAL_INDEX_PATH:
+        return
+    if not force and time.monotonic() - _saved_at < LOCAL_INDEX_SAVE_INTERVAL:
+        return
+    async with _save_lock:
+        _saved_at = time.monotonic()
+        await asyncio.to_thread(_index.save_snapshot, LOCAL_INDEX_PATH)
+
+
+def loaded_local_index() -> Optional[LocalVectorIndex]:
+    """The index if it has been loaded in this process, without loading it."""
+    return _index
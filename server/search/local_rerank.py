@@ -0,0 +1,93 @@
+"""CPU-only lexical reranker.
+
+Scores candidates with BM25 over the same `cols_to_embed` text sent to Voyage
+and blends it with the first-stage (vector or fusion) score. There is no
+network round trip, and a typical candidate set takes about a millisecond,
+so it serves as a fast path for small sets and as the fallback when Voyage
+is slow or down.
+
+IDF comes from the candidate set itself: the only corpus at hand, and the
+one the ranking is relative to.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Share of the blended score given to BM25; the rest is the first-stage score.
+LOCAL_RERANK_WEIGHT = float(os.getenv("LOCAL_RERANK_WEIGHT", "0.5"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def bm25_scores(
+    query: str,
+    documents: Sequence[str],
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> np.ndarray:
+    """BM25 score of every document for `query`, one vectorized pass.
+
+    Only query terms contribute, so term frequencies form a
+    documents x query-terms matrix.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not documents or not terms:
+        return np.zeros(len(documents), dtype=np.float32)
+
+    counts = [Counter(tokenize(doc)) for doc in documents]
+    tf = np.array([[count[term] for term in terms] for count in counts], dtype=np.float32)
+    lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+    avg_length = lengths.mean() or 1.0
+
+    n = len(documents)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / avg_length)
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min() if len(values) else 0.0
+    return (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
+
+
+def local_rerank(
+    query: str,
+    documents: Sequence[str],
+    prior_scores: Sequence[float],
+    top_k: int,
+    weight: float = LOCAL_RERANK_WEIGHT,
+) -> List[Tuple[int, float]]:
+    """Top `top_k` `(index, score)` pairs, the shape of a Voyage ranking.
+
+    BM25 and `prior_scores` are min-max scaled to [0, 1] within the set and
+    blended as `weight * bm25 + (1 - weight) * prior`.
+
+    Args:
+        query: User query.
+        documents: Candidate texts, see `build_rerank_documents`.
+        prior_scores: First-stage score of each candidate.
+        top_k: Number of candidates to keep.
+        weight: Share of the BM25 score in the blend.
+    """
+    lexical = _min_max(bm25_scores(query, documents))
+    prior = _min_max(np.asarray(prior_scores, dtype=np.float32))
+    blended = weight * lexical + (1 - weight) * prior
+    # Stable sort keeps first-stage order among ties.
+    order = np.argsort(-blended, kind="stable")[:top_k]
+    return [(int(idx), float(blended[idx])) for idx in order]
+
+
+def prior_score(result: Dict[str, Any]) -> float:
+    """First-stage score of a search result: fusion score for hybrid, else vector score."""
+    return float(result.get("fusion_score", result.get("score", 0.0)))
@@ -0,0 +1,97 @@
+"""Convert stored embeddings to another storage format.
+
+Walks the collection in `_id` order and rewrites every embedding that is not
+already in the target format (see `server.common.vectors`). Safe to re-run:
+converted documents are skipped.
+
+Usage:
+    python -m server.search.migrate_embeddings --to float32 --batch-size 500
+"""
+
+import argparse
+import os
+from typing import Any, Dict
+
+from pymongo import ASCENDING, UpdateOne
+
+from server.common.db import VERSION_FIELD, get_collection
+from server.common.logging import get_logger
+from server.common.vectors import (
+    STORAGE_FORMATS,
+    decode_embedding,
+    embedding_bson_size,
+    encode_embedding,
+    storage_format,
+)
+from server.search.result_cache import bump_write_version
+
+logger = get_logger("migrate_embeddings")
+
+
+def migrate_embeddings(collection, target: str, batch_size: int = 500, dry_run: bool = False) -> Dict[str, Any]:
+    """Rewrite embeddings into the `target` storage format.
+
+    Args:
+        collection: Listings collection.
+        target: One of `array`, `float32` or `int8`.
+        batch_size: Documents read and written per round trip.
+        dry_run: Only count documents and bytes that would change.
+    """
+    if target not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage format: {target}")
+
+    stats = {"scanned": 0, "converted": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = None
+    while True:
+        query: Dict[str, Any] = {"embedding": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        docs = list(
+            collection.find(query, {"embedding": 1})
+            .sort("_id", ASCENDING)
+            .limit(batch_size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        updates = []
+        for doc in docs:
+            stats["scanned"] += 1
+            stored = doc["embedding"]
+            if storage_format(stored) == target:
+                continue
+            encoded = encode_embedding(decode_embedding(stored), target)
+            stats["converted"] += 1
+            stats["bytes_before"] += embedding_bson_size(stored)
+            stats["bytes_after"] += embedding_bson_size(encoded)
+            updates.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {"embedding": encoded}, "$inc": {VERSION_FIELD: 1}},
+            ))
+
+        if updates and not dry_run:
+            collection.bulk_write(updates, ordered=False)
+            # Quantized vectors shift scores slightly.
+            bump_write_version(collection)
+        logger.info(f"Scanned {stats['scanned']}, converted {stats['converted']}, last _id {last_id}")
+
+    logger.info(f"Migration finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--to", dest="target", choices=STORAGE_FORMATS, required=True)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--database", default=os.getenv("MONGO_DB_NAME"))
+    parser.add_argument("--collection", default=os.getenv("MONGO_COLLECTION_NAME"))
+    args = parser.parse_args()
+
+    migrate_embeddings(
+        get_collection(args.database, args.collection),
+        target=args.target,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,230 @@
+"""Change-stream driven re-embedding worker.
+
+Tails the listings collection's change stream and re-embeds documents whose
+embedded text changed. Updates that touch none of `cols_to_embed` (a price
+change, the worker's own embedding writes, `migrate_embeddings` rewriting
+vectors) are skipped from the update description alone, so documents
+embedded before `embedding_hash` existed are not re-embedded by unrelated
+writes. Other events are skipped when the stored `embedding_hash` still
+matches the `build_text` output.
+
+Change streams need a replica set. For local runs, start a single-node one
+and point the worker at it:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+    python -m server.search.reembed_worker --uri "mongodb://localhost:27017/?replicaSet=rs0"
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import MongoClient, UpdateOne
+
+from server.common.db import VERSION_FIELD, get_collection
+from server.common.embedding_store import embed_texts, get_embedding_store
+from server.common.logging import get_logger
+from server.common.utils import gemini_embed_documents
+from server.common.vectors import encode_embedding
+from server.search.backfill import dead_letter
+from server.search.generate_embeddings import build_text, cols_to_embed, content_hash
+from server.search.result_cache import bump_write_version
+
+logger = get_logger("reembed_worker")
+
+WORKER_STATE_COLLECTION = os.getenv("REEMBED_STATE_COLLECTION", "embedding_worker_state")
+
+
+def change_stream_pipeline() -> List[Dict[str, Any]]:
+    """Only forward writes, trimmed to the fields that feed the embedding.
+
+    Updates carry `changedFields`, the updated and removed field paths, in
+    place of the update description so new vectors are not sent back.
+    """
+    projection = {
+        "operationType": 1,
+        "documentKey": 1,
+        "changedFields": 1,
+        "fullDocument._id": 1,
+        "fullDocument.embedding_hash": 1,
+    }
+    projection.update({f"fullDocument.{col}": 1 for col in cols_to_embed})
+    changed_fields = {
+        "$concatArrays": [
+            {
+                "$map": {
+                    "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                    "in": "$$this.k",
+                }
+            },
+            {"$ifNull": ["$updateDescription.removedFields", []]},
+        ]
+    }
+    return [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}},
+        {"$addFields": {"changedFields": changed_fields}},
+        {"$project": projection},
+    ]
+
+
+def touches_embedded_text(change: Dict[str, Any]) -> bool:
+    """False for updates whose changed fields are all outside `cols_to_embed`."""
+    if change.get("operationType") != "update" or "changedFields" not in change:
+        return True
+    return any(path.split(".", 1)[0] in cols_to_embed for path in change["changedFields"])
+
+
+class ReembedWorker:
+    """Batches changed documents from a change stream and re-embeds them.
+
+    Args:
+        collection: Listings collection (sync pymongo) on a replica set.
+        batch_size: Maximum documents per embedding request.
+        max_wait_seconds: Longest time a pending change waits for a full batch.
+        embed_fn: Embedding function with the `gemini_embed_documents` interface.
+        worker_id: Key under which the resume token is stored.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 50,
+        max_wait_seconds: float = 2.0,
+        embed_fn: Callable[[List[str]], Optional[List[Any]]] = gemini_embed_documents,
+        worker_id: str = "reembed_worker",
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.embed_fn = embed_fn
+        self.store = get_embedding_store()
+        self.worker_id = worker_id
+        self.state = collection.database[WORKER_STATE_COLLECTION]
+        self.pending: Dict[Any, Dict[str, Any]] = {}
+        self._saved_token: Optional[Dict[str, Any]] = None
+        self._saved_at = 0.0
+        self.stats = {"events": 0, "skipped": 0, "embedded": 0, "failed": 0}
+
+    def load_resume_token(self) -> Optional[Dict[str, Any]]:
+        state = self.state.find_one({"_id": self.worker_id})
+        return state["resume_token"] if state else None
+
+    def save_resume_token(self, token: Optional[Dict[str, Any]], force: bool = False) -> None:
+        if token is None or token == self._saved_token:
+            return
+        # Skipped events still advance the token; persist it at most once per wait window.
+        if not force and time.monotonic() - self._saved_at < self.max_wait_seconds:
+            return
+        self.state.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"resume_token": token, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        self._saved_token = token
+        self._saved_at = time.monotonic()
+
+    def handle_change(self, change: Dict[str, Any]) -> None:
+        """Queue a changed document if its embedded text no longer matches."""
+        self.stats["events"] += 1
+        if not touches_embedded_text(change):
+            self.stats["skipped"] += 1
+            return
+        doc = change.get("fullDocument")
+        if not doc:
+            # Deleted before the update lookup ran.
+            self.stats["skipped"] += 1
+            return
+        if content_hash(doc) == doc.get("embedding_hash"):
+            self.stats["skipped"] += 1
+            return
+        # Later events for the same document replace earlier ones.
+        self.pending[doc["_id"]] = doc
+
+    def flush(self) -> None:
+        """Embed and store every pending document in one request per batch."""
+        docs = list(self.pending.values())
+        self.pending = {}
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            vectors = embed_texts([build_text(doc) for doc in batch], self.embed_fn, self.store)
+            if vectors is None:
+                dead_letter(self.collection.database, batch, self.worker_id, "embedding request failed")
+                self.stats["failed"] += len(batch)
+                continue
+            self.collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"]},
+                        {
+                            "$set": {
+                                "embedding": encode_embedding(values),
+                                "embedding_hash": content_hash(doc),
+                            },
+                            "$inc": {VERSION_FIELD: 1},
+                        },
+                    )
+                    for doc, values in zip(batch, vectors)
+                ],
+                ordered=False,
+            )
+            bump_write_version(self.collection)
+            self.stats["embedded"] += len(batch)
+        logger.info(f"Re-embed worker stats: {self.stats}")
+
+    def run(self, max_events: Optional[int] = None) -> Dict[str, int]:
+        """Tail the change stream until interrupted or `max_events` are seen."""
+        resume_token = self.load_resume_token()
+        with self.collection.watch(
+            change_stream_pipeline(),
+            full_document="updateLookup",
+            resume_after=resume_token,
+            max_await_time_ms=int(self.max_wait_seconds * 1000),
+        ) as stream:
+            logger.info("Watching collection for changes")
+            flush_at = None
+            while stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    self.handle_change(change)
+                    if self.pending and flush_at is None:
+                        flush_at = time.monotonic() + self.max_wait_seconds
+
+                due = flush_at is not None and time.monotonic() >= flush_at
+                if len(self.pending) >= self.batch_size or (self.pending and due):
+                    self.flush()
+                    flush_at = None
+
+                # Only checkpoint once everything seen so far has been written.
+                if not self.pending:
+                    self.save_resume_token(stream.resume_token)
+
+                if max_events is not None and self.stats["events"] >= max_events:
+                    break
+
+        if self.pending:
+            self.flush()
+        self.save_resume_token(stream.resume_token, force=True)
+        return self.stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=None, help="Connect to this URI instead of MONGO_CLIENT_URI.")
+    parser.add_argument("--database", default=os.getenv("MONGO_DB_NAME"))
+    parser.add_argument("--collection", default=os.getenv("MONGO_COLLECTION_NAME"))
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-wait-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.uri:
+        collection = MongoClient(args.uri)[args.database][args.collection]
+    else:
+        collection = get_collection(args.database, args.collection)
+
+    ReembedWorker(
+        collection,
+        batch_size=args.batch_size,
+        max_wait_seconds=args.max_wait_seconds,
+    ).run()
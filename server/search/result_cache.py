@@ -0,0 +1,284 @@
+"""Semantic cache of final search results.
+
+Near-duplicate queries ("2 bedroom flat Barcelona beach" / "two-bedroom
+apartment near Barcelona beach") embed to nearly the same vector. Results
+are stored next to the query vector, and a new query with the same search
+parameters is answered from the cache when its cosine similarity to a cached
+query reaches `SEMANTIC_CACHE_SIMILARITY`.
+
+Entries are dropped least recently used first, after `SEMANTIC_CACHE_TTL_SECONDS`,
+and as soon as the collection write version moves past the one they were
+stored under. Every process that changes search results (API workers,
+backfill, re-embed worker, embedding migration) `$inc`s a shared counter
+document in `WRITE_VERSION_COLLECTION`; each API worker reads it at most
+once per `WRITE_VERSION_POLL_SECONDS` and drops its cache when it moved.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+import numpy as np
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from server.common.logging import get_logger
+
+logger = get_logger("result_cache")
+
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "500"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "300"))
+SEMANTIC_CACHE_SIMILARITY = float(os.getenv("SEMANTIC_CACHE_SIMILARITY", "0.97"))
+# One counter document per listings collection, keyed by its name.
+WRITE_VERSION_COLLECTION = os.getenv("WRITE_VERSION_COLLECTION", "cache_versions")
+WRITE_VERSION_POLL_SECONDS = float(os.getenv("WRITE_VERSION_POLL_SECONDS", "1"))
+
+
+class SemanticResultCache:
+    """LRU cache of search results looked up by query-vector similarity.
+
+    Query vectors live in one preallocated float32 matrix, so a lookup is a
+    single matrix-vector product however full the cache is.
+
+    Args:
+        max_size (int): Maximum number of cached searches; 0 disables the cache.
+        ttl_seconds (float): Seconds an entry stays valid after being set.
+        similarity (float): Minimum cosine similarity for a cache hit.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SEMANTIC_CACHE_SIZE,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        similarity: float = SEMANTIC_CACHE_SIMILARITY,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.write_version = 0
+        # Last shared write version seen, and when it was read.
+        self.shared_version: Optional[int] = None
+        self.checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # slot -> (params, result, expires_at, write_version), in LRU order.
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Iterable[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, slot: int) -> None:
+        del self._entries[slot]
+        self._vectors[slot] = 0
+        self._free.append(slot)
+
+    def _reset(self) -> None:
+        self._entries.clear()
+        if self._vectors is not None:
+            self._vectors[:] = 0
+        self._free = list(range(self.max_size - 1, -1, -1))
+
+    def get(self, query_vector: List[float], params: Hashable) -> Optional[Any]:
+        """Result of the most similar cached query with the same `params`, or None."""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            if not self._entries or len(query_vector) != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._vectors @ self._normalize(query_vector)
+            candidates = np.flatnonzero(scores >= self.similarity)
+            now = time.monotonic()
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                slot = int(slot)
+                entry = self._entries.get(slot)
+                if entry is None:
+                    continue
+                entry_params, result, expires_at, version = entry
+                if expires_at < now or version != self.write_version:
+                    self._drop(slot)
+                    continue
+                if entry_params != params:
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                return result
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        query_vector: List[float],
+        params: Hashable,
+        result: Any,
+        write_version: Optional[int] = None,
+    ) -> None:
+        """Cache `result` for a query vector and its search parameters.
+
+        Pass the `write_version` read before the search started: if a write
+        landed meanwhile, the result may already be stale and is not cached.
+        """
+        if self.max_size <= 0:
+            return
+        vector = self._normalize(query_vector)
+        with self._lock:
+            if write_version is not None and write_version != self.write_version:
+                return
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._reset()
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = (
+                params, result, time.monotonic() + self.ttl_seconds, self.write_version
+            )
+
+    def invalidate(self) -> None:
+        """Mark every cached result stale; call after writing to the collection."""
+        with self._lock:
+            self.write_version += 1
+            self.invalidations += 1
+            self._reset()
+
+    def acknowledge(self, shared_version: int) -> None:
+        """Record the version this process's own write bumped to.
+
+        Only when no other write landed since the last one seen; otherwise
+        the next poll invalidates.
+        """
+        with self._lock:
+            if self.shared_version is not None and shared_version == self.shared_version + 1:
+                self.shared_version = shared_version
+
+    def observe(self, shared_version: int) -> None:
+        """Invalidate if the shared write version moved since it was last seen."""
+        if shared_version == self.shared_version:
+            return
+        if self.shared_version is not None:
+            self.invalidate()
+        self.shared_version = shared_version
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._reset()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity": self.similarity,
+            "write_version": self.write_version,
+            "shared_write_version": self.shared_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+result_cache = SemanticResultCache()
+
+
+def _version_filter(collection) -> Dict[str, Any]:
+    return {"_id": collection.name}
+
+
+def bump_write_version(collection) -> Optional[int]:
+    """Record a write to a sync listings collection; returns the new version.
+
+    Failures are logged, not raised: the write itself succeeded, and cached
+    results still expire after the TTL.
+    """
+    try:
+        doc = collection.database[WRITE_VERSION_COLLECTION].find_one_and_update(
+            _version_filter(collection),
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
+    except PyMongoError as e:
+        logger.warning(f"Could not bump the search cache write version: {e}")
+        return None
+
+
+async def _bump_shared_version(collection) -> None:
+    try:
+        doc = await collection.database[WRITE_VERSION_COLLECTION].find_one_and_update(
+            _version_filter(collection),
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except PyMongoError as e:
+        logger.warning(f"Could not bump the search cache write version: {e}")
+        return
+    result_cache.acknowledge(doc["version"])
+
+
+# Version bumps in flight; kept referenced until they finish.
+_pending_bumps: Set[asyncio.Task] = set()
+
+
+async def invalidate_search_results(collection) -> None:
+    """Drop this process's cached results and bump the shared write version.
+
+    Call after writing to the async listings collection. The bump runs in
+    the background so it does not add a round trip to the write; other
+    workers see it on their next poll.
+    """
+    result_cache.invalidate()
+    task = asyncio.create_task(_bump_shared_version(collection))
+    _pending_bumps.add(task)
+    task.add_done_callback(_pending_bumps.discard)
+
+
+async def wait_for_version_bumps() -> None:
+    """Wait for background version bumps, e.g. before shutting down."""
+    if _pending_bumps:
+        await asyncio.gather(*_pending_bumps, return_exceptions=True)
+
+
+async def refresh_write_version(collection) -> None:
+    """Invalidate `result_cache` if any process wrote since the last check.
+
+    Reads the shared counter at most once per `WRITE_VERSION_POLL_SECONDS`.
+    """
+    if result_cache.max_size <= 0:
+        return
+    now = time.monotonic()
+    if now - result_cache.checked_at < WRITE_VERSION_POLL_SECONDS:
+        return
+    result_cache.checked_at = now
+    try:
+        doc = await collection.database[WRITE_VERSION_COLLECTION].find_one(
+            _version_filter(collection), {"version": 1}
+        )
+    except PyMongoError as e:
+        logger.warning(f"Could not read the search cache write version: {e}")
+        return
+    result_cache.observe((doc or {}).get("version", 0))
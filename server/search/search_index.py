@@ -1,60 +1,434 @@
 """Search an Index."""
 
+import asyncio
+import hashlib
 import os
-from typing import Any, Dict, List
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from pymongo.operations import SearchIndexModel
-from dotenv import load_dotenv
 import voyageai
 
-from server.common.db import client
+from server.common.cache import TTLCache
+from server.common.db import PRICE_VALUE_FIELD, get_async_client, get_client
 from server.common.logging import logger
-from server.common.utils import gemini_embed_documents
+from server.common.metrics import RERANK_FALLBACKS, timed
+from server.common.models import NumberRange, SearchFilters
+from server.common.resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceeded,
+    DependencyError,
+    run_stage,
+    stage_timeout
+)
+from server.common.utils import (
+    EMBEDDING_DIMENSIONS,
+    embed_queries,
+    embed_query,
+    gemini_breaker,
+    normalize_query
+)
+from server.common.vectors import EMBEDDING_STORAGE, encode_query_vector
 from server.search.generate_embeddings import cols_to_embed
+from server.search.local_index import REVIEW_FIELD, SEARCH_BACKEND, get_local_index
+from server.search.local_rerank import local_rerank, prior_score
+from server.search.result_cache import refresh_write_version, result_cache
 
+_voyage_client: Optional[voyageai.AsyncClient] = None
 
-load_dotenv()
+RERANK_MODEL = os.getenv("RERANK_MODEL", "rerank-2.5")
 
-vo = voyageai.Client()
+rerank_cache = TTLCache(
+    max_size=int(os.getenv("RERANK_CACHE_SIZE", "5000")),
+    ttl_seconds=float(os.getenv("RERANK_CACHE_TTL_SECONDS", "3600")),
+)
+rerank_counters = {"remote_calls": 0, "short_circuits": 0, "local_reranks": 0}
 
+RERANKERS = ("voyage", "local", "auto")
+# Default reranker. "auto" uses Voyage and falls back to the local reranker
+# when Voyage fails, times out or its breaker is open.
+RERANKER = os.getenv("RERANKER", "auto")
+# In auto mode, candidate sets smaller than this skip the Voyage round trip
+# and use the local reranker; 0 disables the shortcut.
+LOCAL_RERANK_BELOW = int(os.getenv("LOCAL_RERANK_BELOW", "0"))
 
-def search_vector_store(
+TEXT_INDEX_NAME = os.getenv("TEXT_INDEX_NAME", "listings_text")
+# String fields searched by the lexical half of hybrid search.
+TEXT_SEARCH_PATHS = [
+    "name",
+    "summary",
+    "description",
+    "neighborhood_overview",
+    "property_type",
+    "room_type",
+    "amenities",
+    "address.street",
+    "address.suburb",
+    "address.market",
+    "address.country",
+]
+# `SearchFilters` field -> document path. Each is declared as a filter
+# field of the vector index so it can be applied inside `$vectorSearch`.
+FILTER_PATHS = {
+    "price": PRICE_VALUE_FIELD,
+    "accommodates": "accommodates",
+    "bedrooms": "bedrooms",
+    "property_type": "property_type",
+    "room_type": "room_type",
+    "country": "address.country",
+    "amenities": "amenities",
+}
+# Mirror path -> source path, for documents written before the mirror
+# existed (see `backfill_price_values`).
+MIRRORED_PATHS = {PRICE_VALUE_FIELD: "price"}
+# Documents fetched per round trip when streaming hydrated results.
+HYDRATE_CHUNK_SIZE = int(os.getenv("HYDRATE_CHUNK_SIZE", "50"))
+# Reciprocal rank fusion constant; larger values flatten rank differences.
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Default end-to-end budget for embed, search and rerank; 0 disables it.
+SEARCH_LATENCY_BUDGET_MS = float(os.getenv("SEARCH_LATENCY_BUDGET_MS", "2000"))
+# Per-stage caps, applied within the remaining budget.
+VECTOR_SEARCH_TIMEOUT_MS = float(os.getenv("VECTOR_SEARCH_TIMEOUT_MS", "1000"))
+RERANK_TIMEOUT_MS = float(os.getenv("RERANK_TIMEOUT_MS", "600"))
+# Reranking is skipped, keeping search order, when less budget than this is left.
+RERANK_MIN_BUDGET_MS = float(os.getenv("RERANK_MIN_BUDGET_MS", "100"))
+
+# Skips reranking while Voyage is unhealthy.
+voyage_breaker = CircuitBreaker("voyage")
+
+
+def get_voyage_client() -> voyageai.AsyncClient:
+    """The process-wide Voyage client, created on first use."""
+    global _voyage_client
+    if _voyage_client is None:
+        _voyage_client = voyageai.AsyncClient()
+    return _voyage_client
+
+
+def _listings_collection():
+    return get_async_client()[os.getenv("MONGO_DB_NAME")][os.getenv("MONGO_COLLECTION_NAME")]
+
+
+def _range(value: NumberRange) -> Dict[str, float]:
+    bounds = {"$gte": value.gte, "$lte": value.lte}
+    return {op: bound for op, bound in bounds.items() if bound is not None}
+
+
+def build_search_filter(
+    filters: Optional[SearchFilters],
+    reviews_rating: Optional[int] = None,
+    indexed_only: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Compile request filters into a `$vectorSearch` pre-filter.
+
+    Only `$and`, `$or`, `$exists`, `$eq`, `$in`, `$gte` and `$lte` are used,
+    so the result is also a valid `find` query. A range on a mirrored path
+    also matches documents without the mirror, on the source path; with
+    `indexed_only` (for `$vectorSearch`, where the source is not indexed)
+    such documents are let through for `build_fallback_filter`. Returns None
+    when nothing is filtered.
+    """
+    clauses = []
+    if reviews_rating:
+        clauses.append({REVIEW_FIELD: {"$gte": reviews_rating}})
+    if filters is not None:
+        for field, path in FILTER_PATHS.items():
+            value = getattr(filters, field)
+            if value is None:
+                continue
+            if isinstance(value, NumberRange):
+                clause = {path: _range(value)}
+                if path in MIRRORED_PATHS:
+                    unmirrored = {path: {"$exists": False}}
+                    if not indexed_only:
+                        unmirrored[MIRRORED_PATHS[path]] = _range(value)
+                    clause = {"$or": [clause, unmirrored]}
+                clauses.append(clause)
+            elif field == "amenities":
+                # Every amenity must be present; `$eq` on an array matches an element.
+                clauses += [{path: {"$eq": amenity}} for amenity in value]
+            elif isinstance(value, list):
+                clauses.append({path: {"$in": value}})
+            else:
+                clauses.append({path: {"$eq": value}})
+    return {"$and": clauses} if clauses else None
+
+
+def build_fallback_filter(filters: Optional[SearchFilters]) -> Optional[Dict[str, Any]]:
+    """`$match` applying mirrored ranges to documents that lack the mirror.
+
+    Runs after `$vectorSearch`; documents with the mirror were already
+    filtered inside it. Returns None when no mirrored path is filtered.
+    """
+    clauses = []
+    if filters is not None:
+        for field, path in FILTER_PATHS.items():
+            value = getattr(filters, field)
+            if path in MIRRORED_PATHS and isinstance(value, NumberRange):
+                clauses.append({"$or": [
+                    {path: {"$exists": True}},
+                    {MIRRORED_PATHS[path]: _range(value)},
+                ]})
+    return {"$and": clauses} if clauses else None
+
+
+def _rerank_projection() -> Dict[str, int]:
+    """Just the fields the reranker reads, for the first phase of a two-phase search."""
+    return {"_id": 1, **{col: 1 for col in cols_to_embed}}
+
+
+def _with_scores(doc: Dict[str, Any], res: Dict[str, Any]) -> Dict[str, Any]:
+    """Full document plus the score fields of its narrow search result."""
+    scores = {
+        key: res[key]
+        for key in ("score", "text_score", "fusion_score", "rerank_score")
+        if key in res
+    }
+    return {**doc, **scores}
+
+
+async def _fetch_documents(ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+    with timed("hydrate"):
+        cursor = _listings_collection().find({"_id": {"$in": ids}}, {"embedding": 0})
+        return {doc["_id"]: doc async for doc in cursor}
+
+
+async def hydrate_documents(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replace narrow search results with full documents in a single `$in` fetch.
+
+    Order and the `score` / `rerank_score` fields of `results` are kept.
+    """
+    if not results:
+        return []
+    docs = await _fetch_documents([res["_id"] for res in results])
+    return [
+        _with_scores(docs[res["_id"]], res)
+        for res in results
+        if res["_id"] in docs
+    ]
+
+
+async def iter_hydrated_documents(
+    results: List[Dict[str, Any]],
+    chunk_size: int = HYDRATE_CHUNK_SIZE
+) -> AsyncIterator[Dict[str, Any]]:
+    """Like `hydrate_documents`, but fetches and yields `chunk_size` documents at a time.
+
+    Only one chunk of full documents is held in memory.
+    """
+    for start in range(0, len(results), chunk_size):
+        chunk = results[start:start + chunk_size]
+        docs = await _fetch_documents([res["_id"] for res in chunk])
+        for res in chunk:
+            if res["_id"] in docs:
+                yield _with_scores(docs[res["_id"]], res)
+
+
+async def search_local_index(
+    query_vector: List[float],
+    limit: int,
+    reviews_rating: int,
+    return_full_documents: bool,
+    similarity_threshold: float,
+    two_phase: bool = False,
+    filters: Optional[SearchFilters] = None
+) -> List[Dict[str, Any]]:
+    """Search the in-process vector index, returning the Atlas result shape.
+
+    `filters` are resolved to the matching `_id`s with one `find`, then
+    applied as a pre-filter like `$vectorSearch` does.
+    """
+    collection = _listings_collection()
+    index = await get_local_index(collection)
+    allowed_ids = None
+    search_filter = build_search_filter(filters)
+    if search_filter is not None:
+        with timed("db_find"):
+            cursor = collection.find(search_filter, {"_id": 1})
+            allowed_ids = [doc["_id"] async for doc in cursor]
+    with timed("vector_search"):
+        hits = [
+            (doc_id, score)
+            for doc_id, score in index.search(query_vector, limit, reviews_rating, allowed_ids)
+            if score >= similarity_threshold
+        ]
+    if not hits:
+        return []
+
+    if return_full_documents and two_phase:
+        projection = _rerank_projection()
+    elif return_full_documents:
+        projection = {"embedding": 0}
+    else:
+        projection = {"_id": 1, "review_scores.review_scores_value": 1}
+    with timed("db_find"):
+        cursor = collection.find({"_id": {"$in": [doc_id for doc_id, _ in hits]}}, projection)
+        docs = {doc["_id"]: doc async for doc in cursor}
+    return [
+        {**docs[doc_id], "score": score}
+        for doc_id, score in hits
+        if doc_id in docs
+    ]
+
+
+async def search_text_index(
+    user_query: str,
+    limit: int,
+    reviews_rating: int,
+    return_full_documents: bool,
+    two_phase: bool = False,
+    filters: Optional[SearchFilters] = None
+) -> List[Dict[str, Any]]:
+    """Search the Atlas Search text index (see `create_text_search_index`).
+
+    Results carry a `text_score` and use the same projection as
+    `search_vector_store`. `filters` are applied before the limit.
+    """
+    search_config = {
+        "$search": {
+            "index": TEXT_INDEX_NAME,
+            "compound": {
+                "must": [
+                    {
+                        "text": {
+                            "query": user_query,
+                            "path": TEXT_SEARCH_PATHS
+                        }
+                    }
+                ]
+            }
+        }
+    }
+    if reviews_rating:
+        search_config["$search"]["compound"]["filter"] = [
+            {
+                "range": {
+                    "path": "review_scores.review_scores_value",
+                    "gte": reviews_rating
+                }
+            }
+        ]
+
+    text_score = {"$meta": "searchScore"}
+    pipeline = [search_config]
+    search_filter = build_search_filter(filters)
+    if search_filter is not None:
+        pipeline.append({"$match": search_filter})
+    pipeline.append({"$limit": limit})
+    if return_full_documents and two_phase:
+        pipeline.append({"$project": {**_rerank_projection(), "text_score": text_score}})
+    elif return_full_documents:
+        pipeline += [
+            {"$addFields": {"text_score": text_score}},
+            {"$project": {"embedding": 0}}
+        ]
+    else:
+        pipeline.append({
+            "$project": {
+                "_id": 1,
+                "review_scores.review_scores_value": 1,
+                "text_score": text_score
+            }
+        })
+
+    with timed("text_search"):
+        cursor = await _listings_collection().aggregate(pipeline)
+        return await cursor.to_list(length=None)
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]],
+    k: int = 60
+) -> List[Dict[str, Any]]:
+    """Merge ranked result lists by reciprocal rank fusion.
+
+    Each document scores `sum(1 / (k + rank))` over the lists it appears
+    in, stored as `fusion_score`. Fields from every list are merged, so a
+    document found by both searches keeps its `score` and `text_score`.
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, res in enumerate(results, start=1):
+            entry = fused.setdefault(res["_id"], {"fusion_score": 0.0})
+            entry.update(res)
+            entry["fusion_score"] += 1 / (k + rank)
+    return sorted(fused.values(), key=lambda res: res["fusion_score"], reverse=True)
+
+
+async def search_vector_store(
     user_query: str, 
     num_candidates: int, 
     limit: int,
     reviews_rating: int,
     return_full_documents: bool,
-    similarity_threshold: float
+    similarity_threshold: float,
+    two_phase: bool = False,
+    query_vector: Optional[List[float]] = None,
+    filters: Optional[SearchFilters] = None
 ):
-    """Search Atlas Vector Search Index."""
-    embedded_query = gemini_embed_documents(
-            [user_query]
-        )[0].values
-    
+    """Search Atlas Vector Search Index.
+
+    With `two_phase` and `return_full_documents`, only `_id`, the score and
+    the rerank text fields are returned; see `hydrate_documents`. Pass
+    `query_vector` when the query has already been embedded. `reviews_rating`
+    and `filters` are applied inside `$vectorSearch`, before ranking.
+    """
+    embedded_query = query_vector
+    if embedded_query is None:
+        embedded_query = await embed_query(user_query)
+
+    if SEARCH_BACKEND == "local":
+        return await search_local_index(
+            query_vector=embedded_query,
+            limit=limit,
+            reviews_rating=reviews_rating,
+            return_full_documents=return_full_documents,
+            similarity_threshold=similarity_threshold,
+            two_phase=two_phase,
+            filters=filters
+        )
+
     # Config with user query. 
     vector_search_config =  {
             '$vectorSearch': {
                 'index': os.getenv("INDEX_NAME"), 
                 'path': 'embedding', 
-                'queryVector': embedded_query, 
+                'queryVector': encode_query_vector(embedded_query), 
                 'numCandidates': num_candidates, 
                 'limit': limit
             }
         }
         
-    if reviews_rating:
-        vector_search_config["$vectorSearch"]["filter"] = {
-                '$and': [
-                {
-                    "review_scores.review_scores_value": {
-                        "$gte": reviews_rating
+    search_filter = build_search_filter(filters, reviews_rating, indexed_only=True)
+    if search_filter is not None:
+        vector_search_config["$vectorSearch"]["filter"] = search_filter
+    # Construct search pipeline. The score only exists after
+    # `$vectorSearch`, so the threshold `$match` follows the first stage
+    # that exposes it.
+    pipeline = [vector_search_config]
+    fallback_filter = build_fallback_filter(filters)
+    if fallback_filter is not None:
+        pipeline.append({"$match": fallback_filter})
+    if return_full_documents and two_phase:
+        pipeline += [
+            {
+                "$project": {
+                    **_rerank_projection(),
+                    "score": {
+                        "$meta": "vectorSearchScore"
                     }
                 }
-                ]
-        }
-    # Construct search pipeline. 
-    pipeline = [vector_search_config]
-    if return_full_documents:
+            },
+            {
+                "$match": {
+                    "score": { "$gte": similarity_threshold }
+                }
+            },
+        ]
+    elif return_full_documents:
         pipeline += [
             {
                 "$addFields": {
@@ -90,106 +464,459 @@ def search_vector_store(
             },
         ]
         
-    db_name = os.getenv("MONGO_DB_NAME")
-    collection_name = os.getenv("MONGO_COLLECTION_NAME")
     # Get top results. 
-    atlas_results = list(client[db_name][collection_name].aggregate(pipeline)) 
+    with timed("vector_search"):
+        cursor = await _listings_collection().aggregate(pipeline)
+        atlas_results = await cursor.to_list(length=None)
     return atlas_results
 
 
-def rerank_results(
+def build_rerank_documents(atlas_results: List[Dict[str, Any]]) -> List[str]:
+    """Text sent to the reranker for each candidate."""
+    documents = []
+    for res in atlas_results:
+        curr_doc = ""
+        for col in cols_to_embed:
+            curr_doc += f"""
+            {res.get(col, "")}
+            """
+        documents.append(curr_doc)
+    return documents
+
+
+def _rerank_cache_key(
+    user_query: str,
     atlas_results: List[Dict[str, Any]],
-    user_query: str, 
+    documents: List[str],
     top_k: int
+):
+    """Key on the query, model, candidate order and candidate content.
+
+    The content fingerprint keeps edited listings from reusing stale scores.
+    """
+    fingerprint = hashlib.sha256("\x1f".join(documents).encode("utf-8")).hexdigest()
+    candidate_ids = tuple(str(res.get("_id")) for res in atlas_results)
+    return (normalize_query(user_query), RERANK_MODEL, top_k, candidate_ids, fingerprint)
+
+
+def breaker_stats() -> Dict[str, Any]:
+    """State of the Gemini and Voyage circuit breakers."""
+    return {"gemini": gemini_breaker.stats(), "voyage": voyage_breaker.stats()}
+
+
+def rerank_stats() -> Dict[str, Any]:
+    """Rerank cache counters plus how often the remote call was skipped."""
+    stats = rerank_cache.stats()
+    stats.update(rerank_counters)
+    lookups = sum(rerank_counters.values()) + stats["hits"]
+    avoided = stats["hits"] + rerank_counters["short_circuits"] + rerank_counters["local_reranks"]
+    stats["avoided_rate"] = avoided / lookups if lookups else 0.0
+    return stats
+
+
+def _search_deadline(latency_budget_ms: Optional[float]) -> Optional[Deadline]:
+    """Deadline for one search; `SEARCH_LATENCY_BUDGET_MS` unless overridden."""
+    budget_ms = latency_budget_ms or SEARCH_LATENCY_BUDGET_MS
+    return Deadline(budget_ms) if budget_ms > 0 else None
+
+
+async def rerank_results(
+    atlas_results: List[Dict[str, Any]],
+    user_query: str, 
+    top_k: int,
+    deadline: Optional[Deadline] = None,
+    reranker: str = "voyage"
 ) -> List[Dict[str, Any]]:
-    """Reranker of Vector Search results."""
-    try:
-        documents = []
-        for res in atlas_results:
-            curr_doc = ""
-            for col in cols_to_embed:
-                curr_doc += f"""
-                {res.get(col, "")}
-                """
-            documents.append(curr_doc)
-        
-        reranking = vo.rerank(
-            user_query, 
-            documents, 
-            model="rerank-2.5", 
-            top_k=top_k
-        )
-        final_results = []
-        for result in reranking.results:
-            idx = result.index
-            score = result.relevance_score
-            doc = atlas_results[idx]
-            doc_with_score = {**doc, "rerank_score": score}
-            final_results.append(doc_with_score)  
-        return final_results
-    except Exception as e:
-        logger.error(f"Error reranking results: {e}")
+    """Reranker of Vector Search results.
+
+    With `reranker="local"`, candidates are scored in-process by
+    `local_rerank`. Otherwise the Voyage call is bounded by
+    `RERANK_TIMEOUT_MS` and the request `deadline`, and skipped while
+    `voyage_breaker` is open.
+
+    Raises:
+        DependencyError: Voyage reranking failed, timed out or was skipped.
+    """
+    # Nothing to narrow down: keep vector order, scored by the prior, and
+    # skip the remote call.
+    if len(atlas_results) <= top_k:
+        rerank_counters["short_circuits"] += 1
+        return _apply_ranking(atlas_results, _prior_ranking(atlas_results))
+
+    documents = build_rerank_documents(atlas_results)
+    if reranker == "local":
+        rerank_counters["local_reranks"] += 1
+        with timed("rerank_local"):
+            ranking = local_rerank(user_query, documents, [prior_score(res) for res in atlas_results], top_k)
+        return _apply_ranking(atlas_results, ranking)
+
+    cache_key = _rerank_cache_key(user_query, atlas_results, documents, top_k)
+    ranking = rerank_cache.get(cache_key)
+    if ranking is None:
+        if deadline is not None and deadline.remaining() * 1000 < RERANK_MIN_BUDGET_MS:
+            raise DeadlineExceeded("rerank", "not enough latency budget left to rerank")
+        if not voyage_breaker.allow():
+            raise DependencyError("rerank", "Voyage circuit breaker is open")
+        rerank_counters["remote_calls"] += 1
+        try:
+            with timed("rerank"):
+                reranking = await run_stage(
+                    "rerank",
+                    get_voyage_client().rerank(
+                        user_query, 
+                        documents, 
+                        model=RERANK_MODEL, 
+                        top_k=top_k
+                    ),
+                    stage_timeout(deadline, RERANK_TIMEOUT_MS / 1000),
+                    deadline
+                )
+        except DeadlineExceeded:
+            voyage_breaker.release()
+            raise
+        except Exception as e:
+            voyage_breaker.record_failure()
+            if isinstance(e, DependencyError):
+                raise
+            raise DependencyError("rerank", str(e)) from e
+        except BaseException:
+            # Cancelled, e.g. the client disconnected: free a half-open trial.
+            voyage_breaker.release()
+            raise
+        voyage_breaker.record_success()
+        ranking = [(result.index, result.relevance_score) for result in reranking.results]
+        rerank_cache.set(cache_key, ranking)
+    return _apply_ranking(atlas_results, ranking)
+
+
+def _prior_ranking(atlas_results: List[Dict[str, Any]]):
+    """Search order as an `(index, score)` ranking scored by `prior_score`."""
+    return [(i, prior_score(res)) for i, res in enumerate(atlas_results)]
+
+
+def _apply_ranking(atlas_results: List[Dict[str, Any]], ranking) -> List[Dict[str, Any]]:
+    """Candidates in `(index, score)` ranking order, with `rerank_score` set."""
+    final_results = []
+    for idx, score in ranking:
+        doc = atlas_results[idx]
+        doc_with_score = {**doc, "rerank_score": score}
+        final_results.append(doc_with_score)  
+    return final_results
 
 
-def get_search_results(
+async def _search_and_rerank(
     user_query: str,
-    num_candidates: int = 150, 
-    limit: int = 10,
-    top_k: int = 5, 
-    return_full_documents: bool = True,
-    similarity_threshold: float = 0.0,
-    reviews_rating: int = None
-) -> List[Dict[str, Any]]:
-    # Embed user query. 
-    try:
-        # Semantic Search 
-        atlas_results = search_vector_store(
+    num_candidates: int,
+    limit: int,
+    top_k: int,
+    return_full_documents: bool,
+    similarity_threshold: float,
+    reviews_rating: int,
+    two_phase: bool,
+    hybrid: bool = False,
+    filters: Optional[SearchFilters] = None,
+    reranker: Optional[str] = None,
+    hydrate: bool = True,
+    query_vector: Optional[List[float]] = None,
+    search_semaphore: Optional[asyncio.Semaphore] = None,
+    rerank_semaphore: Optional[asyncio.Semaphore] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """Vector (or hybrid) search, rerank and, for two-phase searches, hydration.
+
+    Embedding and search failures raise `DependencyError`. A failed, slow
+    or skipped Voyage rerank falls back to the local reranker in `auto` mode
+    and to search order otherwise; either way `degraded` is True.
+    """
+    reranker = reranker or RERANKER
+    if reranker not in RERANKERS:
+        raise ValueError(f"Unknown reranker {reranker!r}; expected one of {', '.join(RERANKERS)}")
+    # Two-phase: search and rerank on a narrow projection, then fetch
+    # full documents only for the results that are returned.
+    two_phase = two_phase and return_full_documents
+    if hybrid and SEARCH_BACKEND == "local":
+        logger.warning("Hybrid search needs Atlas Search; using vector search only.")
+        hybrid = False
+    timings = {}
+
+    if query_vector is None:
+        start = time.perf_counter()
+        query_vector = await embed_query(user_query, deadline)
+        timings["embed_ms"] = (time.perf_counter() - start) * 1000
+
+    # Semantic Search 
+    start = time.perf_counter()
+    async with search_semaphore or nullcontext():
+        vector_search = search_vector_store(
             user_query=user_query,
             num_candidates=num_candidates,
             limit=limit,
             reviews_rating=reviews_rating,
             return_full_documents=return_full_documents,
-            similarity_threshold=similarity_threshold
+            similarity_threshold=similarity_threshold,
+            two_phase=two_phase,
+            query_vector=query_vector,
+            filters=filters
         )
-        
-        # Rerank retrieved documents. 
-        final_results = rerank_results(atlas_results, user_query, top_k)
-        
-        # Quota error. 
-        if not final_results:
-            final_results = atlas_results
-                     
-        return {
-            "num_results": len(final_results),
-            "results": final_results
+        if hybrid:
+            # Lexical and vector queries run in parallel, then are fused.
+            search = asyncio.gather(
+                vector_search,
+                search_text_index(
+                    user_query=user_query,
+                    limit=limit,
+                    reviews_rating=reviews_rating,
+                    return_full_documents=return_full_documents,
+                    two_phase=two_phase,
+                    filters=filters
+                )
+            )
+        else:
+            search = vector_search
+        try:
+            search_results = await run_stage(
+                "vector_search",
+                search,
+                stage_timeout(deadline, VECTOR_SEARCH_TIMEOUT_MS / 1000),
+                deadline
+            )
+        except (DependencyError, ValueError):
+            raise
+        except Exception as e:
+            raise DependencyError("vector_search", str(e)) from e
+        if hybrid:
+            atlas_results = reciprocal_rank_fusion(list(search_results), k=RRF_K)[:limit]
+        else:
+            atlas_results = search_results
+    timings["search_ms"] = (time.perf_counter() - start) * 1000
+
+    # Rerank retrieved documents. 
+    start = time.perf_counter()
+    if reranker == "local" or (reranker == "auto" and len(atlas_results) < LOCAL_RERANK_BELOW):
+        used = "local"
+    else:
+        used = "voyage"
+    degraded = False
+    try:
+        async with rerank_semaphore or nullcontext():
+            final_results = await rerank_results(atlas_results, user_query, top_k, deadline, used)
+    except DependencyError as e:
+        # Quota error, timeout or open breaker.
+        degraded = True
+        if reranker == "auto":
+            RERANK_FALLBACKS.labels("local").inc()
+            logger.warning(f"Voyage reranking skipped, using the local reranker: {e}")
+            final_results = await rerank_results(atlas_results, user_query, top_k, reranker="local")
+            used = "local"
+        else:
+            RERANK_FALLBACKS.labels("search_order").inc()
+            logger.warning(f"Reranking skipped, returning search order: {e}")
+            final_results = _apply_ranking(atlas_results, _prior_ranking(atlas_results))
+            used = None
+    timings["rerank_ms"] = (time.perf_counter() - start) * 1000
+
+    if two_phase and hydrate:
+        start = time.perf_counter()
+        final_results = await hydrate_documents(final_results)
+        timings["hydrate_ms"] = (time.perf_counter() - start) * 1000
+
+    return {
+        "num_results": len(final_results),
+        "results": final_results,
+        "reranker": used,
+        "degraded": degraded,
+        "timings": timings
+    }
+
+
+async def get_search_results(
+    user_query: str,
+    num_candidates: int = 150, 
+    limit: int = 10,
+    top_k: int = 5, 
+    return_full_documents: bool = True,
+    similarity_threshold: float = 0.0,
+    reviews_rating: int = None,
+    two_phase: bool = True,
+    hybrid: bool = False,
+    filters: Optional[SearchFilters] = None,
+    reranker: Optional[str] = None,
+    latency_budget_ms: Optional[float] = None
+) -> Dict[str, Any]:
+    """Search and rerank, answering near-duplicate queries from `result_cache`.
+
+    Embedding, search and rerank share one latency budget of
+    `latency_budget_ms` (default `SEARCH_LATENCY_BUDGET_MS`).
+
+    Raises:
+        DeadlineExceeded: The budget ran out before results were found.
+        DependencyError: Embedding or search failed.
+    """
+    deadline = _search_deadline(latency_budget_ms)
+    query_vector = await embed_query(user_query, deadline)
+
+    # Everything but the query text that shapes the results.
+    cache_params = (
+        num_candidates, limit, top_k, return_full_documents,
+        similarity_threshold, reviews_rating, hybrid,
+        filters.model_dump_json(exclude_none=True) if filters is not None else None,
+        reranker or RERANKER
+    )
+    await refresh_write_version(_listings_collection())
+    cached = result_cache.get(query_vector, cache_params)
+    if cached is not None:
+        return cached
+    write_version = result_cache.write_version
+
+    result = await _search_and_rerank(
+        user_query=user_query,
+        num_candidates=num_candidates,
+        limit=limit,
+        top_k=top_k,
+        return_full_documents=return_full_documents,
+        similarity_threshold=similarity_threshold,
+        reviews_rating=reviews_rating,
+        two_phase=two_phase,
+        hybrid=hybrid,
+        filters=filters,
+        reranker=reranker,
+        query_vector=query_vector,
+        deadline=deadline
+    )
+    response = {
+        "num_results": result["num_results"],
+        "results": result["results"]
+    }
+    # Fallbacks are not cached, so the requested reranker is retried.
+    if not result["degraded"]:
+        result_cache.set(query_vector, cache_params, response, write_version)
+    return response
+
+
+async def stream_search_results(
+    latency_budget_ms: Optional[float] = None,
+    **search_params
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run a search now and return an iterator over its results.
+
+    Search and rerank complete before this returns, so failures surface as
+    exceptions rather than mid-stream. Full documents are fetched lazily,
+    chunk by chunk, as the iterator is consumed: candidates are always
+    ranked on the narrow two-phase projection, whatever `two_phase` says.
+
+    Args:
+        latency_budget_ms: Budget for embed, search and rerank.
+        search_params: Keyword arguments accepted by `get_search_results`.
+    """
+    full_documents = search_params.get("return_full_documents")
+    if full_documents:
+        search_params = {**search_params, "two_phase": True}
+    result = await _search_and_rerank(
+        **search_params, hydrate=False, deadline=_search_deadline(latency_budget_ms)
+    )
+    results = result["results"]
+    if full_documents:
+        return iter_hydrated_documents(results)
+
+    async def iterate():
+        for res in results:
+            yield res
+    return iterate()
+
+
+async def get_batch_search_results(
+    searches: List[Dict[str, Any]],
+    max_concurrency: int = 8,
+    rerank_concurrency: int = 4
+) -> Dict[str, Any]:
+    """Run many searches, embedding every query up front.
+
+    All queries are embedded with `embed_queries` (one Gemini call per
+    `EMBEDDING_BATCH_LIMIT` queries), then the vector searches and reranks
+    run concurrently, bounded by their own semaphores.
+
+    Args:
+        searches: Keyword arguments for `get_search_results`, one per query.
+        max_concurrency: Vector searches in flight at once.
+        rerank_concurrency: Rerank calls in flight at once.
+    """
+    start = time.perf_counter()
+    query_vectors = await embed_queries([search["user_query"] for search in searches])
+    embed_ms = (time.perf_counter() - start) * 1000
+
+    search_semaphore = asyncio.Semaphore(max_concurrency)
+    rerank_semaphore = asyncio.Semaphore(rerank_concurrency)
+
+    async def run_one(search: Dict[str, Any], query_vector: Optional[List[float]]):
+        if query_vector is None:
+            return {"user_query": search["user_query"], "error": "Unable to embed search query."}
+        search = dict(search)
+        deadline = _search_deadline(search.pop("latency_budget_ms", None))
+        query_start = time.perf_counter()
+        try:
+            result = await _search_and_rerank(
+                **search,
+                query_vector=query_vector,
+                deadline=deadline,
+                search_semaphore=search_semaphore,
+                rerank_semaphore=rerank_semaphore
+            )
+        except Exception as e:
+            logger.error(f"Error searching index for batch query: {e}")
+            return {"user_query": search["user_query"], "error": str(e)}
+        result["timings"]["total_ms"] = (time.perf_counter() - query_start) * 1000
+        return {"user_query": search["user_query"], **result}
+
+    results = await asyncio.gather(*(
+        run_one(search, query_vector)
+        for search, query_vector in zip(searches, query_vectors)
+    ))
+    return {
+        "num_queries": len(results),
+        "results": results,
+        "timings": {
+            "embed_ms": embed_ms,
+            "total_ms": (time.perf_counter() - start) * 1000
         }
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        logger.error(f"Error searching index: {e}")
+    }
     
     
+def vector_field_definition() -> Dict[str, Any]:
+    """Vector field of the search index, matching `EMBEDDING_STORAGE`.
+
+    Array, float32 and int8 binary vectors share the same definition. Float
+    vectors can additionally be quantized by Atlas at index time through
+    `VECTOR_INDEX_QUANTIZATION` (`scalar` or `binary`); int8 vectors are
+    already quantized.
+    """
+    field = {
+        "type": "vector",
+        "path": "embedding",
+        "numDimensions": EMBEDDING_DIMENSIONS,
+        "similarity": "cosine"
+    }
+    quantization = os.getenv("VECTOR_INDEX_QUANTIZATION")
+    if quantization and EMBEDDING_STORAGE != "int8":
+        field["quantization"] = quantization
+    return field
+
+
 def create_search_index(
     database_name: str, 
     collection_name: str
 ) -> Dict[str, Any]:
     try:
-        db = client[database_name]
+        db = get_client()[database_name]
         collection = db[collection_name]
         search_index_model = SearchIndexModel(
             definition={
                 "fields": [
-                    {
-                        "type": "vector",
-                        "path": "embedding",
-                        "numDimensions": 768,
-                        "similarity": "cosine"
-                    },
+                    vector_field_definition(),
                     {
                         "type": "filter",
                         "path": "review_scores.review_scores_value"
                     },
+                    *({"type": "filter", "path": path} for path in FILTER_PATHS.values()),
                 ]
             },
             name="vector_index_filter",
@@ -206,3 +933,43 @@ def create_search_index(
     except Exception as e:
         logger.info("Unexpected error creating search index.")
         raise RuntimeError("Unexpected error creating search index") from e
+
+
+def create_text_search_index(
+    database_name: str,
+    collection_name: str
+) -> Dict[str, Any]:
+    """Create the Atlas Search text index used by hybrid search.
+
+    Companion to `create_search_index`; indexes `TEXT_SEARCH_PATHS` and the
+    review score used by the rating filter.
+    """
+    try:
+        collection = get_client()[database_name][collection_name]
+        fields: Dict[str, Any] = {}
+        for path in TEXT_SEARCH_PATHS:
+            parent, _, child = path.partition(".")
+            if child:
+                fields.setdefault(parent, {"type": "document", "fields": {}})
+                fields[parent]["fields"][child] = {"type": "string"}
+            else:
+                fields[parent] = {"type": "string"}
+        fields["review_scores"] = {
+            "type": "document",
+            "fields": {"review_scores_value": {"type": "number"}}
+        }
+
+        search_index_model = SearchIndexModel(
+            definition={"mappings": {"dynamic": False, "fields": fields}},
+            name=TEXT_INDEX_NAME,
+            type="search",
+        )
+        result = collection.create_search_index(model=search_index_model)
+        logger.info("MongoDB Text Search Index Created")
+        return {
+            "index_name": result,
+            "status": "created"
+        }
+    except Exception as e:
+        logger.info("Unexpected error creating text search index.")
+        raise RuntimeError("Unexpected error creating text search index") from e
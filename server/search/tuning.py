@@ -0,0 +1,243 @@
+"""Recall/latency tuning of `num_candidates` and `limit`.
+
+For a set of sample queries, computes exact top-k neighbours by brute force
+over every stored `embedding` (the ground truth), then runs the real vector
+search for each `num_candidates` x `limit` pair and reports recall@k against
+p50/p99 latency. Recall@k is the share of the exact top `k` found among the
+`limit` candidates handed to the reranker.
+
+The recommended settings (the fastest pair by p99 that reaches
+`--target-recall`, optionally per `reviews_rating` filter) are written as
+JSON. Point `SEARCH_TUNING_PATH` at the file and the API uses them for
+searches that do not set `num_candidates` or `limit` themselves.
+
+Usage:
+    python -m server.search.tuning --queries queries.txt --output search_tuning.json \\
+        --num-candidates 50 100 150 300 --limits 5 10 20 --reviews-ratings 0 9
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from server.common.db import get_async_collection
+from server.common.logging import get_logger
+from server.common.utils import embed_queries
+from server.search.local_index import REVIEW_FIELD, SEARCH_BACKEND, LocalVectorIndex, build_from_collection
+from server.search.search_index import search_vector_store
+
+logger = get_logger("tuning")
+
+SEARCH_TUNING_PATH = os.getenv("SEARCH_TUNING_PATH")
+# Request fields the tuning file may set.
+TUNED_FIELDS = ("num_candidates", "limit")
+
+_tuning: Optional[Dict[str, Any]] = None
+
+
+def load_search_tuning(path: Optional[str] = SEARCH_TUNING_PATH) -> Optional[Dict[str, Any]]:
+    """Load recommended search settings written by this tool.
+
+    A missing or unreadable file is logged and leaves the defaults in place.
+    """
+    global _tuning
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            _tuning = json.load(f)
+        logger.info(f"Loaded search tuning from {path}: {_tuning.get('default')}")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load search tuning from {path}: {e}")
+        _tuning = None
+    return _tuning
+
+
+def tuned_search_params(reviews_rating: Optional[int] = None) -> Dict[str, int]:
+    """Recommended `num_candidates` / `limit` for a search, or {} if untuned.
+
+    Settings tuned for the exact `reviews_rating` win over the defaults.
+    """
+    if not _tuning:
+        return {}
+    settings = dict(_tuning.get("default") or {})
+    settings.update((_tuning.get("by_reviews_rating") or {}).get(str(reviews_rating or 0), {}))
+    return {field: int(settings[field]) for field in TUNED_FIELDS if field in settings}
+
+
+def recall_at_k(returned_ids: List[Any], true_ids: List[Any]) -> float:
+    """Share of `true_ids` present in `returned_ids`; 1.0 when there is nothing to find."""
+    if not true_ids:
+        return 1.0
+    returned = set(returned_ids)
+    return sum(doc_id in returned for doc_id in true_ids) / len(true_ids)
+
+
+async def evaluate(
+    query_vectors: List[List[float]],
+    ground_truth: List[List[Any]],
+    num_candidates: int,
+    limit: int,
+    reviews_rating: Optional[int],
+    repeats: int = 1,
+) -> Dict[str, Any]:
+    """Mean recall and latency percentiles of one search configuration."""
+    recalls, latencies = [], []
+    for vector, true_ids in zip(query_vectors, ground_truth):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results = await search_vector_store(
+                user_query="",
+                num_candidates=num_candidates,
+                limit=limit,
+                reviews_rating=reviews_rating,
+                return_full_documents=False,
+                similarity_threshold=0.0,
+                query_vector=vector,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(recall_at_k([res["_id"] for res in results], true_ids))
+    return {
+        "num_candidates": num_candidates,
+        "limit": limit,
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def recommend(rows: List[Dict[str, Any]], target_recall: float) -> Dict[str, int]:
+    """Fastest configuration by p99 that reaches `target_recall`.
+
+    Falls back to the highest recall when no configuration reaches it.
+    """
+    passing = [row for row in rows if row["recall"] >= target_recall]
+    if passing:
+        best = min(passing, key=lambda row: (row["p99_ms"], row["num_candidates"], row["limit"]))
+    else:
+        best = max(rows, key=lambda row: (row["recall"], -row["p99_ms"]))
+    return {field: best[field] for field in TUNED_FIELDS}
+
+
+async def run_tuning(
+    collection,
+    queries: List[str],
+    num_candidates_grid: List[int],
+    limit_grid: List[int],
+    reviews_ratings: List[int],
+    k: int = 5,
+    target_recall: float = 0.95,
+    repeats: int = 1,
+) -> Dict[str, Any]:
+    """Sweep the grid for every `reviews_rating` and recommend settings.
+
+    Args:
+        collection: Async listings collection.
+        queries: Sample natural language queries.
+        num_candidates_grid: `num_candidates` values to try.
+        limit_grid: `limit` values to try; those below `k` are skipped.
+        reviews_ratings: Rating filters to tune for; 0 means no filter.
+        k: Size of the exact top-k each configuration should find.
+        target_recall: Recall@k the recommended settings must reach.
+        repeats: Timed runs per query and configuration.
+    """
+    if SEARCH_BACKEND == "local":
+        logger.warning("SEARCH_BACKEND is local, which is exact: recall will always be 1.0.")
+
+    vectors = await embed_queries(queries)
+    query_vectors = [vector for vector in vectors if vector is not None]
+    if len(query_vectors) < len(queries):
+        logger.warning(f"Skipping {len(queries) - len(query_vectors)} queries that failed to embed")
+    if not query_vectors:
+        raise RuntimeError("No query could be embedded.")
+
+    index: LocalVectorIndex = await build_from_collection(collection)
+    total = len(index)
+
+    sweep, by_rating = [], {}
+    for rating in reviews_ratings:
+        ground_truth = [
+            [doc_id for doc_id, _ in index.search(vector, k, rating)]
+            for vector in query_vectors
+        ]
+        matching = (
+            await collection.count_documents({"embedding": {"$exists": True}, REVIEW_FIELD: {"$gte": rating}})
+            if rating else total
+        )
+        selectivity = matching / total if total else 0.0
+
+        rows = []
+        for num_candidates in num_candidates_grid:
+            for limit in limit_grid:
+                # Atlas requires numCandidates >= limit; below k recall is capped.
+                if limit < k or num_candidates < limit:
+                    continue
+                row = await evaluate(query_vectors, ground_truth, num_candidates, limit, rating, repeats)
+                row.update({"reviews_rating": rating, "selectivity": selectivity})
+                logger.info(
+                    f"rating={rating} num_candidates={num_candidates} limit={limit} "
+                    f"recall@{k}={row['recall']:.3f} p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms"
+                )
+                rows.append(row)
+        if rows:
+            by_rating[str(rating)] = recommend(rows, target_recall)
+        sweep += rows
+
+    if not by_rating:
+        raise ValueError("No valid configuration: every limit is below k or above num_candidates.")
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "backend": SEARCH_BACKEND,
+        "documents": total,
+        "queries": len(query_vectors),
+        "k": k,
+        "target_recall": target_recall,
+        "default": by_rating.get("0", next(iter(by_rating.values()))),
+        "by_reviews_rating": by_rating,
+        "sweep": sweep,
+    }
+
+
+def read_queries(path: str) -> List[str]:
+    """One query per line; blank lines and `#` comments are skipped."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+async def main(args: argparse.Namespace) -> None:
+    collection = get_async_collection(args.database, args.collection)
+    report = await run_tuning(
+        collection,
+        queries=read_queries(args.queries),
+        num_candidates_grid=args.num_candidates,
+        limit_grid=args.limits,
+        reviews_ratings=args.reviews_ratings,
+        k=args.k,
+        target_recall=args.target_recall,
+        repeats=args.repeats,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Recommended {report['default']}; by reviews_rating {report['by_reviews_rating']}")
+    logger.info(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="Text file with one sample query per line.")
+    parser.add_argument("--output", default="search_tuning.json")
+    parser.add_argument("--num-candidates", type=int, nargs="+", default=[50, 100, 150, 300, 500])
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--reviews-ratings", type=int, nargs="+", default=[0], help="0 tunes unfiltered searches.")
+    parser.add_argument("--k", type=int, default=5, help="Exact neighbours to find; match the rerank top_k.")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query and configuration.")
+    parser.add_argument("--database", default=os.getenv("MONGO_DB_NAME"))
+    parser.add_argument("--collection", default=os.getenv("MONGO_COLLECTION_NAME"))
+    asyncio.run(main(parser.parse_args()))
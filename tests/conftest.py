@@ -0,0 +1,23 @@
+"""Shared test setup.
+
+Placeholders keep imports from reaching a real deployment; clients are
+created lazily, so nothing connects unless a test installs a stand-in.
+"""
+
+import os
+from types import SimpleNamespace
+
+for _name, _value in {
+    "GOOGLE_API_KEY": "test",
+    "VOYAGE_API_KEY": "test",
+    "MONGO_DB_NAME": "test",
+    "MONGO_COLLECTION_NAME": "listings",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from google.genai import errors
+
+
+def api_error(code: int) -> errors.APIError:
+    """A Gemini API error with the given HTTP status."""
+    return errors.APIError(code, SimpleNamespace(body_segments=[{"error": {"status": str(code)}}]))
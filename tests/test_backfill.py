@@ -0,0 +1,40 @@
+from server.search import generate_embeddings
+from server.search.generate_embeddings import embed_with_retries
+from tests.conftest import api_error
+
+
+def _flaky(failures):
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return [f"vector:{text}" for text in texts]
+    return embed, calls
+
+
+def test_retries_quota_errors_then_succeeds(monkeypatch):
+    embed, calls = _flaky([api_error(429), api_error(503)])
+    monkeypatch.setattr(generate_embeddings, "embed_content", embed)
+    delays = []
+
+    assert embed_with_retries(["a", "b"], max_retries=3, sleep=delays.append) == ["vector:a", "vector:b"]
+    assert len(calls) == 3
+    assert len(delays) == 2
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    embed, calls = _flaky([api_error(429)] * 5)
+    monkeypatch.setattr(generate_embeddings, "embed_content", embed)
+
+    assert embed_with_retries(["a"], max_retries=2, sleep=lambda _: None) is None
+    assert len(calls) == 3
+
+
+def test_non_retryable_error_fails_immediately(monkeypatch):
+    embed, calls = _flaky([api_error(400)])
+    monkeypatch.setattr(generate_embeddings, "embed_content", embed)
+
+    assert embed_with_retries(["a"], max_retries=5, sleep=lambda _: None) is None
+    assert len(calls) == 1
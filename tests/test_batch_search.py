@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.run import seed_documents
+from benchmarks.stubs import FakeGenaiClient, FakeVoyageClient, InMemoryCollection
+from server import main
+from server.common import utils
+from server.search import local_index, search_index
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    collection = InMemoryCollection(seed_documents(20))
+    genai = FakeGenaiClient()
+    monkeypatch.setattr(utils, "_client", genai)
+    monkeypatch.setattr(search_index, "_voyage_client", FakeVoyageClient())
+    monkeypatch.setattr(search_index, "_listings_collection", lambda: collection)
+    monkeypatch.setattr(search_index, "SEARCH_BACKEND", "local")
+    monkeypatch.setattr(local_index, "_index", None)
+    monkeypatch.setattr(main, "collection", collection)
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", False)
+    return genai
+
+
+def test_batch_above_one_embedding_request(genai):
+    searches = [{"user_query": f"apartment number {i}", "top_k": 2} for i in range(150)]
+    with TestClient(main.app) as client:
+        response = client.post("/search/batch", json={"searches": searches})
+
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 150
+    assert genai.models.calls == 2
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from server.common import embedding_store
+from server.common.embedding_store import (
+    EmbeddingStore,
+    complete_embeddings,
+    embed_texts,
+    plan_embeddings,
+    text_hash,
+)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "embeddings.sqlite")
+
+
+def _vector(seed):
+    return [float(seed), 0.5]
+
+
+def test_round_trip_and_counters(path):
+    store = EmbeddingStore(path, model="m", dimensions=2)
+    store.put_many([("a", _vector(1))])
+    assert store.get_many(["a", "b"]) == {"a": _vector(1)}
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_keyed_by_model_and_dimensions(path):
+    EmbeddingStore(path, model="m", dimensions=2).put_many([("a", _vector(1))])
+    assert EmbeddingStore(path, model="other", dimensions=2).get_many(["a"]) == {}
+    assert EmbeddingStore(path, model="m", dimensions=3).get_many(["a"]) == {}
+    assert EmbeddingStore(path, model="m", dimensions=2).get_many(["a"]) == {"a": _vector(1)}
+
+
+def test_evicts_least_recently_used(path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(embedding_store.time, "time", lambda: next(clock))
+    store = EmbeddingStore(path, max_entries=2, model="m", dimensions=2)
+    store.put_many([("a", _vector(1))])
+    store.put_many([("b", _vector(2))])
+    store.get_many(["a"])  # b is now least recently used.
+    store.put_many([("c", _vector(3))])
+
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert store.evictions == 1
+    assert len(store) == 2
+
+
+def test_counts_only_when_estimate_passes_limit(path, monkeypatch):
+    store = EmbeddingStore(path, max_entries=10, model="m", dimensions=2)
+    counts = []
+    count = store._count
+    monkeypatch.setattr(store, "_count", lambda: counts.append(1) or count())
+
+    for i in range(10):
+        store.put_many([(str(i), _vector(i))])
+    assert counts == []
+    store.put_many([("10", _vector(10))])
+    assert counts == [1]
+    assert len(store) == 10
+
+
+def test_recounts_periodically_for_other_writers(path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "EMBEDDING_STORE_RECOUNT_EVERY", 3)
+    store = EmbeddingStore(path, max_entries=4, model="m", dimensions=2)
+    # Another process fills the shared file.
+    EmbeddingStore(path, max_entries=100, model="m", dimensions=2).put_many(
+        [(str(i), _vector(i)) for i in range(6)]
+    )
+    store.put_many([("x", _vector(1)), ("y", _vector(2)), ("z", _vector(3))])
+    assert len(store) == 4
+
+
+def test_plan_sends_each_missing_text_once(path):
+    store = EmbeddingStore(path, model="m", dimensions=2)
+    store.put_many([(text_hash("stored"), _vector(0))])
+    hashes, found, missing = plan_embeddings(["new", "stored", "new", "other"], store)
+
+    assert list(found) == [text_hash("stored")]
+    assert missing == ["new", "other"]
+
+    embeddings = [SimpleNamespace(values=_vector(1)), SimpleNamespace(values=_vector(2))]
+    vectors = complete_embeddings(hashes, found, missing, embeddings, store)
+    assert vectors == [_vector(1), _vector(0), _vector(1), _vector(2)]
+    assert store.get_many([text_hash("other")]) == {text_hash("other"): _vector(2)}
+
+
+def test_failed_request_stores_nothing(path):
+    store = EmbeddingStore(path, model="m", dimensions=2)
+    assert embed_texts(["a", "b"], lambda texts: None, store) is None
+    assert len(store) == 0
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.run import seed_documents
+from benchmarks.stubs import FakeGenaiClient, FakeVoyageClient, InMemoryCollection
+from server import main
+from server.common import utils
+from server.search import local_index, search_index
+
+
+@pytest.fixture
+def client(monkeypatch):
+    collection = InMemoryCollection([
+        {"_id": "1", "name": "Loft", "address": {"country": "Portugal"}},
+        {"_id": "2", "name": "Villa", "address": {"country": "Spain"}},
+    ])
+    monkeypatch.setattr(main, "collection", collection)
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", False)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_export_streams_matching_documents(client):
+    response = client.get("/documents/export", params={"filter": '{"address.country": "Portugal"}', "fields": "name"})
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"_id": "1", "name": "Loft"}]
+
+
+@pytest.mark.parametrize("query", [
+    {"$where": "sleep(1000)"},
+    {"$expr": {"$function": {"body": "function() { return true }", "args": [], "lang": "js"}}},
+    {"$or": [{"name": "Loft"}, {"$where": "true"}]},
+])
+def test_export_rejects_server_side_javascript(client, query):
+    response = client.get("/documents/export", params={"filter": json.dumps(query)})
+    assert response.status_code == 400
+
+
+def test_search_stream_reads_full_documents_lazily(monkeypatch):
+    collection = InMemoryCollection(seed_documents(30))
+    monkeypatch.setattr(utils, "_client", FakeGenaiClient())
+    monkeypatch.setattr(search_index, "_voyage_client", FakeVoyageClient())
+    monkeypatch.setattr(search_index, "_listings_collection", lambda: collection)
+    monkeypatch.setattr(search_index, "SEARCH_BACKEND", "local")
+    monkeypatch.setattr(local_index, "_index", None)
+    searches = []
+    search_local_index = search_index.search_local_index
+
+    async def spy(**kwargs):
+        searches.append(kwargs["two_phase"])
+        return await search_local_index(**kwargs)
+    monkeypatch.setattr(search_index, "search_local_index", spy)
+
+    async def stream():
+        results = await search_index.stream_search_results(
+            user_query="apartment with wifi", num_candidates=30, limit=10, top_k=5,
+            return_full_documents=True, similarity_threshold=0.0, reviews_rating=None, two_phase=False,
+        )
+        return [res async for res in results]
+
+    results = asyncio.run(stream())
+    assert searches == [True]
+    assert len(results) == 5
+    assert all("price" in res and "rerank_score" in res for res in results)
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import InMemoryCollection
+from server.search import local_index
+
+
+def _doc(doc_id, vector, version=1, rating=9):
+    return {"_id": doc_id, "embedding": vector, "_version": version, "review_scores": {"review_scores_value": rating}}
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "index")
+    monkeypatch.setattr(local_index, "LOCAL_INDEX_PATH", path)
+    monkeypatch.setattr(local_index, "_index", None)
+    return path
+
+
+def _load(collection):
+    local_index._index = None
+    return asyncio.run(local_index.get_local_index(collection))
+
+
+def test_snapshot_applies_writes_made_since_it_was_saved(snapshot):
+    collection = InMemoryCollection([_doc(i, [1.0, float(i)]) for i in range(10)])
+    assert len(_load(collection)) == 10
+
+    # Written by another process while the API was down.
+    collection._docs[3] = _doc(3, [0.0, 1.0], version=2, rating=4)
+    del collection._docs[5]
+    collection._docs[10] = _doc(10, [1.0, 10.0])
+
+    index = _load(collection)
+    assert sorted(index.ids) == [i for i in range(11) if i != 5]
+    assert index.versions[3] == 2
+    assert index.search([0.0, 1.0], 1)[0][0] == 3
+    assert 3 not in dict(index.search([0.0, 1.0], 11, reviews_rating=9))
+
+
+def test_rebuilds_when_most_documents_changed(snapshot, monkeypatch):
+    collection = InMemoryCollection([_doc(i, [1.0, float(i)]) for i in range(4)])
+    _load(collection)
+    for i in range(4):
+        collection._docs[i]["_version"] = 2
+    calls = []
+    build = local_index.build_from_collection
+
+    async def counting_build(collection):
+        calls.append(collection)
+        return await build(collection)
+    monkeypatch.setattr(local_index, "build_from_collection", counting_build)
+
+    assert _load(collection).versions == {i: 2 for i in range(4)}
+    assert len(calls) == 1
+
+
+def test_writes_are_saved_to_the_snapshot(snapshot):
+    collection = InMemoryCollection([_doc(i, [1.0, float(i)]) for i in range(3)])
+    index = _load(collection)
+    index.upsert(7, [0.0, 1.0], 8.0, version=1)
+    index.remove(0)
+    asyncio.run(local_index.save_local_index(force=True))
+
+    reloaded = local_index.LocalVectorIndex.load_snapshot(snapshot)
+    assert sorted(reloaded.ids) == [1, 2, 7]
+    assert reloaded.versions[7] == 1
@@ -0,0 +1,24 @@
+import pytest
+from pydantic import ValidationError
+
+from server.common.models import MAX_BATCH_SEARCHES, BatchSearchRequest, SearchRequest
+
+
+@pytest.mark.parametrize("field", ["max_concurrency", "rerank_concurrency"])
+@pytest.mark.parametrize("value", [0, -1, None])
+def test_batch_concurrency_must_be_positive(field, value):
+    with pytest.raises(ValidationError):
+        BatchSearchRequest(searches=[], **{field: value})
+
+
+def test_batch_size_is_capped():
+    searches = [{"user_query": "loft"}] * (MAX_BATCH_SEARCHES + 1)
+    with pytest.raises(ValidationError):
+        BatchSearchRequest(searches=searches)
+    assert len(BatchSearchRequest(searches=searches[:-1]).searches) == MAX_BATCH_SEARCHES
+
+
+@pytest.mark.parametrize("value", [0, -50])
+def test_latency_budget_must_be_positive(value):
+    with pytest.raises(ValidationError):
+        SearchRequest(user_query="loft", latency_budget_ms=value)
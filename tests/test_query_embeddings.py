@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import FakeGenaiClient
+from server.common import utils
+from server.common.resilience import CircuitBreaker
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Texts sent to Gemini, in call order."""
+    calls = []
+    embed = utils.async_embed_content
+
+    async def record(texts):
+        calls.append(list(texts))
+        return await embed(texts)
+
+    monkeypatch.setattr(utils, "_client", FakeGenaiClient())
+    monkeypatch.setattr(utils, "gemini_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(utils, "async_embed_content", record)
+    utils.query_embedding_cache.clear()
+    yield calls
+    utils.query_embedding_cache.clear()
+
+
+def test_embed_query_embeds_the_cache_key(embedded):
+    first = asyncio.run(utils.embed_query("  Beach   HOUSE "))
+    second = asyncio.run(utils.embed_query("beach house"))
+
+    assert embedded == [["beach house"]]
+    assert first == second
+
+
+def test_embed_query_returns_copies(embedded):
+    vector = asyncio.run(utils.embed_query("quiet loft"))
+    vector[0] = 42.0
+
+    assert asyncio.run(utils.embed_query("quiet loft"))[0] != 42.0
+
+
+def test_embed_queries_normalizes_and_copies(embedded):
+    vectors = asyncio.run(utils.embed_queries(["Loft ", "loft", "garden flat"]))
+
+    assert embedded == [["loft", "garden flat"]]
+    assert vectors[0] == vectors[1] and vectors[0] is not vectors[1]
+    vectors[0][0] = 42.0
+    assert asyncio.run(utils.embed_query("loft"))[0] != 42.0
@@ -0,0 +1,26 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import InMemoryCollection
+from server import main
+from server.common.rate_limit import AsyncRateLimiter
+
+
+@pytest.mark.parametrize("rates", [(0, 1000), (60, 0), (-1, 1000)])
+def test_limiter_rejects_non_positive_rates(rates):
+    with pytest.raises(ValueError):
+        AsyncRateLimiter(*rates)
+
+
+@pytest.mark.parametrize("body", [
+    {"requests_per_minute": 0},
+    {"tokens_per_minute": -5},
+    {"concurrency": 0},
+    {"batch_size": 0},
+])
+def test_batch_embeddings_rejects_invalid_settings(monkeypatch, body):
+    monkeypatch.setattr(main, "collection", InMemoryCollection())
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", False)
+    with TestClient(main.app) as client:
+        response = client.post("/documents/batch-embeddings", json=body)
+    assert response.status_code == 422
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+from server.search.backfill import DEAD_LETTER_COLLECTION
+from server.search.generate_embeddings import content_hash
+from server.search.reembed_worker import ReembedWorker
+from server.search.result_cache import WRITE_VERSION_COLLECTION
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection(self)
+        return self[name]
+
+
+class FakeCollection:
+    """Sync collection that records `bulk_write` requests."""
+
+    name = "listings"
+
+    def __init__(self, database=None):
+        self.requests = []
+        self.version = 0
+        self.database = database if database is not None else FakeDatabase()
+
+    def find_one_and_update(self, filter, update, upsert=False, return_document=False):
+        self.version += update["$inc"]["version"]
+        return {"_id": filter["_id"], "version": self.version}
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests += requests
+        return SimpleNamespace(modified_count=len(requests))
+
+
+def _worker(embed_fn=None):
+    collection = FakeCollection()
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        return [SimpleNamespace(values=[0.1, 0.2]) for _ in texts]
+    return ReembedWorker(collection, embed_fn=embed_fn or embed), collection, calls
+
+
+def _doc(doc_id, **fields):
+    return {"_id": doc_id, "name": "Loft", "summary": "Near the beach", **fields}
+
+
+def _update(doc, changed):
+    return {"operationType": "update", "changedFields": changed, "fullDocument": doc}
+
+
+def test_skips_updates_outside_embedded_fields():
+    worker, collection, calls = _worker()
+    # Backfilled before embedding_hash existed.
+    doc = _doc(1)
+    worker.handle_change(_update(doc, ["price", "last_modified"]))
+    worker.handle_change(_update(doc, ["embedding"]))
+    worker.flush()
+
+    assert worker.stats["skipped"] == 2
+    assert calls == []
+    assert collection.requests == []
+
+
+def test_reembeds_updates_to_embedded_fields():
+    worker, collection, calls = _worker()
+    worker.handle_change(_update(_doc(1), ["summary"]))
+    worker.handle_change(_update(_doc(2, address={"country": "Spain"}), ["address.country"]))
+    worker.flush()
+
+    assert worker.stats["embedded"] == 2
+    assert len(calls) == 1 and len(calls[0]) == 2
+    assert [request._filter for request in collection.requests] == [{"_id": 1}, {"_id": 2}]
+    assert collection.database[WRITE_VERSION_COLLECTION].version == 1
+
+
+def test_skips_unchanged_content_hash():
+    worker, _, calls = _worker()
+    doc = _doc(1)
+    doc["embedding_hash"] = content_hash(doc)
+    worker.handle_change({"operationType": "replace", "fullDocument": doc})
+    worker.handle_change({"operationType": "insert", "fullDocument": _doc(2)})
+
+    assert worker.stats["skipped"] == 1
+    assert list(worker.pending) == [2]
+
+
+def test_failed_batch_is_dead_lettered():
+    worker, collection, _ = _worker(embed_fn=lambda texts: None)
+    worker.handle_change(_update(_doc(1), ["name"]))
+    worker.flush()
+
+    assert worker.stats["failed"] == 1
+    assert collection.requests == []
+    assert [request._filter for request in collection.database[DEAD_LETTER_COLLECTION].requests] == [{"_id": 1}]
@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.stubs import FakeGenaiClient, FakeVoyageClient
+from server.common import utils
+from server.common.resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceeded,
+    DependencyError,
+    hedged,
+    run_stage,
+)
+from server.search import search_index
+
+
+def _half_open(reset_seconds=60.0):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.opened_at -= reset_seconds
+    return breaker
+
+
+def test_breaker_opens_after_threshold_and_allows_one_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = _half_open()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_abandoned_trial_expires():
+    breaker = _half_open()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker._trial_started_at -= 60
+    assert breaker.allow()
+
+
+def test_run_stage_separates_stage_timeout_from_deadline():
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(DependencyError) as error:
+        asyncio.run(run_stage("embed", slow(), 0.01, Deadline(1000)))
+    assert not isinstance(error.value, DeadlineExceeded)
+
+    deadline = Deadline(10)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run_stage("embed", slow(), deadline.timeout(), deadline))
+
+
+def test_hedged_returns_first_copy_to_finish():
+    delays = iter([1.0, 0.01])
+    started = []
+
+    async def call():
+        delay = next(delays)
+        started.append(delay)
+        await asyncio.sleep(delay)
+        return delay
+
+    start = time.perf_counter()
+    assert asyncio.run(hedged(call, hedge_after=0.02)) == 0.01
+    assert started == [1.0, 0.01]
+    assert time.perf_counter() - start < 0.5
+
+
+def test_hedged_raises_last_error_when_all_copies_fail():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError(len(calls))
+
+    with pytest.raises(ValueError, match="2"):
+        asyncio.run(hedged(call, hedge_after=1.0))
+
+
+def test_cancelled_embed_releases_half_open_trial(monkeypatch):
+    breaker = _half_open()
+    monkeypatch.setattr(utils, "gemini_breaker", breaker)
+    monkeypatch.setattr(utils, "_client", FakeGenaiClient(latency_ms=500))
+
+    async def cancel_embedding():
+        task = asyncio.create_task(utils.embed_query("cancelled trial query"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_embedding())
+    assert breaker.allow()
+
+
+def _candidates(count):
+    return [{"_id": i, "name": f"listing {i}", "score": 1 - i / 100} for i in range(count)]
+
+
+def test_short_circuit_keeps_order_and_sets_rerank_score(monkeypatch):
+    monkeypatch.setattr(search_index, "_voyage_client", None)
+    candidates = _candidates(3)
+
+    results = asyncio.run(search_index.rerank_results(candidates, "few candidates", top_k=3))
+    assert [res["_id"] for res in results] == [0, 1, 2]
+    assert [res["rerank_score"] for res in results] == [res["score"] for res in candidates]
+    assert "rerank_score" not in candidates[0]
+
+
+def test_slow_rerank_fails_and_counts_against_breaker(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=60)
+    monkeypatch.setattr(search_index, "voyage_breaker", breaker)
+    monkeypatch.setattr(search_index, "_voyage_client", FakeVoyageClient(latency_ms=500))
+    monkeypatch.setattr(search_index, "RERANK_TIMEOUT_MS", 20)
+
+    with pytest.raises(DependencyError):
+        asyncio.run(search_index.rerank_results(_candidates(10), "slow rerank", top_k=3))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(DependencyError, match="circuit breaker is open"):
+        asyncio.run(search_index.rerank_results(_candidates(10), "short circuited", top_k=3))
+
+
+def test_rerank_out_of_budget_does_not_count_against_breaker(monkeypatch):
+    breaker = _half_open()
+    monkeypatch.setattr(search_index, "voyage_breaker", breaker)
+    monkeypatch.setattr(search_index, "_voyage_client", FakeVoyageClient(latency_ms=500))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(search_index.rerank_results(_candidates(10), "budget", top_k=3, deadline=Deadline(150)))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from benchmarks.stubs import InMemoryCollection
+from server.search import result_cache as cache_module
+from server.search.result_cache import (
+    WRITE_VERSION_COLLECTION,
+    SemanticResultCache,
+    invalidate_search_results,
+    refresh_write_version,
+    wait_for_version_bumps,
+)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SemanticResultCache(max_size=4, ttl_seconds=60, similarity=0.9)
+    monkeypatch.setattr(cache_module, "result_cache", cache)
+    return cache
+
+
+def _refresh(collection, cache):
+    cache.checked_at = float("-inf")
+    asyncio.run(refresh_write_version(collection))
+
+
+def test_write_from_another_process_invalidates(cache):
+    collection = InMemoryCollection()
+    _refresh(collection, cache)
+    cache.set([1.0, 0.0], "params", "result")
+    assert cache.get([1.0, 0.0], "params") == "result"
+
+    # e.g. the re-embed worker.
+    asyncio.run(collection.database[WRITE_VERSION_COLLECTION].update_one(
+        {"_id": collection.name}, {"$inc": {"version": 1}}, upsert=True
+    ))
+    _refresh(collection, cache)
+    assert cache.get([1.0, 0.0], "params") is None
+
+
+def test_unchanged_version_keeps_entries(cache):
+    collection = InMemoryCollection()
+    _refresh(collection, cache)
+    cache.set([1.0, 0.0], "params", "result")
+    _refresh(collection, cache)
+    assert cache.get([1.0, 0.0], "params") == "result"
+
+
+async def _write(collection):
+    await invalidate_search_results(collection)
+    await wait_for_version_bumps()
+
+
+def test_own_write_bumps_shared_version_once(cache):
+    collection = InMemoryCollection()
+    _refresh(collection, cache)
+    asyncio.run(_write(collection))
+    assert cache.shared_version == 1
+
+    cache.set([1.0, 0.0], "params", "result")
+    _refresh(collection, cache)
+    assert cache.get([1.0, 0.0], "params") == "result"
+
+
+def test_version_is_read_once_per_poll_interval(cache, monkeypatch):
+    collection = InMemoryCollection()
+    reads = []
+    versions = collection.database[WRITE_VERSION_COLLECTION]
+    find_one = versions.find_one
+
+    async def counting_find_one(*args, **kwargs):
+        reads.append(args)
+        return await find_one(*args, **kwargs)
+    monkeypatch.setattr(versions, "find_one", counting_find_one)
+
+    _refresh(collection, cache)
+    asyncio.run(refresh_write_version(collection))
+    assert len(reads) == 1
+
+
+def test_concurrent_write_elsewhere_is_not_acknowledged_away(cache):
+    collection = InMemoryCollection()
+    _refresh(collection, cache)
+    asyncio.run(collection.database[WRITE_VERSION_COLLECTION].update_one(
+        {"_id": collection.name}, {"$inc": {"version": 1}}, upsert=True
+    ))
+    asyncio.run(_write(collection))
+    assert cache.shared_version == 0
+
+    cache.set([1.0, 0.0], "params", "result")
+    _refresh(collection, cache)
+    assert cache.get([1.0, 0.0], "params") is None
@@ -0,0 +1,74 @@
+import asyncio
+
+from bson.decimal128 import Decimal128
+
+from benchmarks.stubs import matches
+from server.common.db import with_price_value
+
+from server.common.models import NumberRange, SearchFilters
+from server.search import search_index
+
+
+class CapturingCollection:
+    def __init__(self):
+        self.pipelines = []
+
+    async def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length=None):
+        return []
+
+
+def _search(monkeypatch, filters):
+    collection = CapturingCollection()
+    monkeypatch.setattr(search_index, "SEARCH_BACKEND", "atlas")
+    monkeypatch.setattr(search_index, "_listings_collection", lambda: collection)
+    asyncio.run(search_index.search_vector_store(
+        user_query="",
+        num_candidates=100,
+        limit=10,
+        reviews_rating=9,
+        return_full_documents=False,
+        similarity_threshold=0.0,
+        query_vector=[0.1, 0.2],
+        filters=filters,
+    ))
+    return collection.pipelines[0]
+
+
+def test_price_is_pre_filtered_on_the_mirror(monkeypatch):
+    filters = SearchFilters(price=NumberRange(lte=150), room_type=["Entire home/apt"])
+    vector_search, fallback = _search(monkeypatch, filters)[:2]
+
+    assert vector_search["$vectorSearch"]["filter"] == {"$and": [
+        {search_index.REVIEW_FIELD: {"$gte": 9}},
+        {"$or": [{"price_value": {"$lte": 150}}, {"price_value": {"$exists": False}}]},
+        {"room_type": {"$in": ["Entire home/apt"]}},
+    ]}
+    # Only documents without the mirror are checked on the Decimal128 price.
+    assert fallback == {"$match": {"$and": [
+        {"$or": [{"price_value": {"$exists": True}}, {"price": {"$lte": 150}}]},
+    ]}}
+
+
+def test_no_fallback_match_without_price(monkeypatch):
+    pipeline = _search(monkeypatch, SearchFilters(bedrooms=NumberRange(gte=2)))
+    assert "$match" not in pipeline[1]
+
+
+def test_find_filter_covers_documents_with_and_without_mirror():
+    search_filter = search_index.build_search_filter(SearchFilters(price=NumberRange(gte=50, lte=150)))
+    docs = [
+        {"_id": 1, "price": Decimal128("100"), "price_value": 100.0},
+        {"_id": 2, "price": Decimal128("300"), "price_value": 300.0},
+        {"_id": 3, "price": Decimal128("120")},
+        {"_id": 4, "price": Decimal128("20")},
+    ]
+    assert [doc["_id"] for doc in docs if matches(doc, search_filter)] == [1, 3]
+
+
+def test_writes_set_price_mirror():
+    assert with_price_value({"price": Decimal128("99.50")})["price_value"] == 99.5
+    assert "price_value" not in with_price_value({"name": "Loft"})
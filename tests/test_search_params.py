@@ -0,0 +1,35 @@
+import pytest
+
+from server import main
+from server.common.models import SearchRequest
+from server.search import tuning
+
+
+@pytest.fixture(autouse=True)
+def tuned(monkeypatch):
+    monkeypatch.setattr(tuning, "_tuning", {"default": {"num_candidates": 50, "limit": 10}})
+
+
+def _pair(**fields):
+    params = main.search_params(SearchRequest(user_query="loft", **fields))
+    return params["num_candidates"], params["limit"]
+
+
+def test_tuned_pair_applies_when_client_sets_neither():
+    assert _pair() == (50, 10)
+
+
+def test_tuned_pair_is_not_mixed_with_client_limit():
+    # Default num_candidates (150) is kept and never falls below the limit.
+    assert _pair(limit=100) == (150, 100)
+    assert _pair(limit=400) == (400, 400)
+
+
+def test_tuned_pair_is_not_mixed_with_client_num_candidates():
+    assert _pair(num_candidates=500) == (500, 10)
+    assert _pair(num_candidates=3, top_k=2) == (3, 3)
+
+
+def test_limit_covers_top_k():
+    assert _pair(top_k=20) == (50, 20)
+    assert _pair(top_k=60) == (60, 60)